@@ -0,0 +1,58 @@
+"""Bandingkan laporan benchmark dengan baseline yang disimpan."""
+import json
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _change(current: float | None, base: float | None) -> float | None:
+    if current is None or not base:
+        return None
+    return round((current - base) / base * 100, 2)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 10.0) -> list[dict]:
+    """
+    Per stage: perubahan p95 latency dan throughput (%) terhadap baseline.
+    Regresi = p95 naik atau throughput turun lebih dari `tolerance` persen.
+    """
+    rows = []
+    for name, stage in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if "latency_ms" not in stage:
+            # semua request stage ini gagal
+            rows.append({"stage": name, "status": "failed"})
+            continue
+        if not base or "latency_ms" not in base:
+            rows.append({"stage": name, "status": "new"})
+            continue
+        p95 = _change(stage["latency_ms"]["p95"], base["latency_ms"]["p95"])
+        tput = _change(stage.get("throughput"), base.get("throughput"))
+        regression = (p95 is not None and p95 > tolerance) or (tput is not None and tput < -tolerance)
+        rows.append({
+            "stage": name,
+            "p95_ms": stage["latency_ms"]["p95"],
+            "baseline_p95_ms": base["latency_ms"]["p95"],
+            "p95_change_pct": p95,
+            "throughput": stage.get("throughput"),
+            "baseline_throughput": base.get("throughput"),
+            "throughput_change_pct": tput,
+            "status": "regression" if regression else "ok",
+        })
+    return rows
+
+
+def format_table(rows: list[dict]) -> str:
+    lines = [f"{'stage':<24} {'p95 ms':>10} {'Δp95 %':>8} {'throughput':>12} {'Δtput %':>8}  status"]
+    for r in rows:
+        if r["status"] in ("new", "failed"):
+            lines.append(f"{r['stage']:<24} {'-':>10} {'-':>8} {'-':>12} {'-':>8}  {r['status']}")
+            continue
+        fmt = lambda v: "-" if v is None else f"{v:+.1f}"  # noqa: E731
+        lines.append(
+            f"{r['stage']:<24} {r['p95_ms']:>10.1f} {fmt(r['p95_change_pct']):>8} "
+            f"{(r['throughput'] or 0):>12.2f} {fmt(r['throughput_change_pct']):>8}  {r['status']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+"""Generator dokumen sintetis (PDF / DOCX / CSV) untuk benchmark ingestion."""
+import csv
+import os
+import random
+
+import docx
+import fitz  # PyMuPDF
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+CSV_MIME = "text/csv"
+
+VOCAB = (
+    "dokumen kebijakan karyawan laporan keuangan pengiriman gudang produk "
+    "pelanggan kontrak layanan sistem jaringan keamanan data server aplikasi "
+    "prosedur pelatihan anggaran kuartal pendapatan biaya vendor pembelian "
+    "invoice approval manager finance policy request access account error "
+    "timeout database backup restore incident report customer support ticket"
+).split()
+
+
+class TextGenerator:
+    """Teks acak deterministik (seed) dengan sesekali kode error / SKU."""
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    def word(self) -> str:
+        roll = self.rng.random()
+        if roll < 0.01:
+            return f"E-{self.rng.randint(1000, 9999)}"
+        if roll < 0.02:
+            return f"SKU-{self.rng.randint(10000, 99999)}"
+        return self.rng.choice(VOCAB)
+
+    def sentence(self, words: int) -> str:
+        return " ".join(self.word() for _ in range(words)).capitalize() + "."
+
+    def paragraph(self, words: int) -> str:
+        out, left = [], words
+        while left > 0:
+            n = min(left, self.rng.randint(8, 20))
+            out.append(self.sentence(n))
+            left -= n
+        return " ".join(out)
+
+
+def make_pdf(path: str, pages: int, words_per_page: int = 350, seed: int = 0) -> str:
+    gen = TextGenerator(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), gen.paragraph(words_per_page), fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_docx(path: str, paragraphs: int, words_per_paragraph: int = 80, seed: int = 0) -> str:
+    gen = TextGenerator(seed)
+    document = docx.Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(gen.paragraph(words_per_paragraph))
+    document.save(path)
+    return path
+
+
+def make_csv(path: str, rows: int, cols: int = 6, seed: int = 0) -> str:
+    gen = TextGenerator(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"kolom_{i}" for i in range(cols)])
+        for _ in range(rows):
+            writer.writerow([gen.sentence(gen.rng.randint(2, 6)) for _ in range(cols)])
+    return path
+
+
+def make_corpus(workdir: str, pdf_pages: int, docx_paragraphs: int, csv_rows: int, seed: int = 0) -> list[dict]:
+    """Buat satu file per tipe; return [{"kind", "path", "mime", "bytes"}]."""
+    os.makedirs(workdir, exist_ok=True)
+    files = [
+        ("pdf", make_pdf(os.path.join(workdir, "bench.pdf"), pdf_pages, seed=seed), PDF_MIME),
+        ("docx", make_docx(os.path.join(workdir, "bench.docx"), docx_paragraphs, seed=seed), DOCX_MIME),
+        ("csv", make_csv(os.path.join(workdir, "bench.csv"), csv_rows, seed=seed), CSV_MIME),
+    ]
+    return [
+        {"kind": kind, "path": path, "mime": mime, "bytes": os.path.getsize(path)}
+        for kind, path, mime in files
+    ]
@@ -0,0 +1,325 @@
+"""
+Benchmark end-to-end ingestion + query.
+
+Stage offline (in-process, butuh model embedding + vector store):
+    extract_pdf (>= PDF_PARALLEL_MIN_PAGES, jalur paralel) / extract_pdf_small
+    (single-process) / extract_docx / extract_csv, chunk, embed, vector_write,
+    vector_query
+Stage HTTP (opsional, `--base-url` ke server yang sedang jalan):
+    http_query (/docs/query), http_ask (/docs/ask), http_chat_send (/chat/send),
+    http_ingest (/docs/process sampai job indexed; butuh ingest worker)
+
+Untuk stage HTTP jalankan server dengan LLM_PROVIDER=stub supaya latency
+LLM tetap (STUB_LLM_FIRST_TOKEN_MS / STUB_LLM_TOKEN_MS / STUB_LLM_TOKENS).
+
+    cd apps/backend
+    python -m benchmarks.run --pdf-pages 200 --base-url http://localhost:8000 \\
+        --baseline benchmarks/results/baseline.json
+    python -m benchmarks.run ... --save-baseline   # jadikan hasil ini baseline
+
+Laporan JSON: p50/p95/p99 + mean (ms) dan throughput per stage.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.baseline import compare, format_table, load_report
+from benchmarks.fixtures import PDF_MIME, TextGenerator, make_corpus, make_pdf
+from benchmarks.stats import summarize
+from core.config import get_settings
+from domain.documents.embedder import chunk_text
+from domain.documents.extractor import extract_text
+from infra.db.vector_store import get_vector_store
+from infra.llm.embedder import get_embedder
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+INGEST_POLL_S = 0.2
+INGEST_TIMEOUT_S = 600.0
+
+
+# --- stage offline -----------------------------------------------------------
+
+def bench_extract(files: list[dict], repeats: int, stages: dict) -> dict[str, str]:
+    texts = {}
+    for f in files:
+        samples = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            texts[f["kind"]] = extract_text(f["path"], f["mime"])
+            samples.append(time.perf_counter() - t0)
+        stages[f"extract_{f['kind']}"] = summarize(samples, items=f["bytes"] * repeats / 1e6, unit="MB")
+    return texts
+
+
+def bench_chunk(texts: dict[str, str], repeats: int, stages: dict) -> list[str]:
+    samples, produced, chunks = [], 0, []
+    for text in texts.values():
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            out = chunk_text(text)
+            samples.append(time.perf_counter() - t0)
+            produced += len(out)
+        chunks.extend(out)
+    stages["chunk"] = summarize(samples, items=produced, unit="chunks")
+    return chunks
+
+
+def bench_embed(chunks: list[str], batch_size: int, stages: dict) -> list:
+    embedder = get_embedder()
+    embedder.load()  # waktu load model tidak ikut diukur
+    samples, batches = [], []
+    for s in range(0, len(chunks), batch_size):
+        batch = chunks[s:s + batch_size]
+        t0 = time.perf_counter()
+        batches.append(embedder.embed_batch(batch))
+        samples.append(time.perf_counter() - t0)
+    stages["embed"] = summarize(samples, items=len(chunks), unit="chunks")
+    return batches
+
+
+def bench_vectors(chunks: list[str], batches: list, n_queries: int, stages: dict) -> None:
+    """Tulis ke collection sementara lalu query; collection dihapus di akhir."""
+    store = get_vector_store()
+    name = f"bench_{uuid.uuid4().hex[:8]}"
+    collection = store.collection(name)
+    try:
+        samples, offset = [], 0
+        for emb in batches:
+            ids = [f"bench_{offset + i}" for i in range(len(emb))]
+            t0 = time.perf_counter()
+            collection.upsert(
+                ids=ids,
+                embeddings=emb,
+                documents=chunks[offset:offset + len(emb)],
+                metadatas=[{"document_id": "bench", "chunk_index": offset + i} for i in range(len(emb))],
+            )
+            samples.append(time.perf_counter() - t0)
+            offset += len(emb)
+        stages["vector_write"] = summarize(samples, items=offset, unit="chunks")
+
+        gen = TextGenerator(seed=1)
+        queries = get_embedder().embed_batch([gen.sentence(8) for _ in range(n_queries)])
+        samples = []
+        for q in queries:
+            t0 = time.perf_counter()
+            collection.query(query_embeddings=q[None, :], n_results=3)
+            samples.append(time.perf_counter() - t0)
+        stages["vector_query"] = summarize(samples, unit="queries")
+    finally:
+        store.drop_collection(name)
+
+
+# --- stage HTTP --------------------------------------------------------------
+
+async def _load(make_request, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                response = await make_request(i)
+                response.raise_for_status()
+            except Exception:
+                errors += 1
+                return
+            samples.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+
+    result = summarize(samples, wall_s=wall, unit="req") if samples else {"count": 0}
+    result.update({"errors": errors, "concurrency": concurrency})
+    return result
+
+
+async def bench_http(base_url: str, n: int, concurrency: int, stages: dict) -> None:
+    gen = TextGenerator(seed=2)
+    # pertanyaan unik per request supaya answer cache tidak membuat hasil terlalu optimis
+    questions = [f"{gen.sentence(8)} ({i})" for i in range(n)]
+    timeout = httpx.Timeout(120.0)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        stages["http_query"] = await _load(
+            lambda i: client.get("/docs/query", params={"q": questions[i], "top_k": 3}), n, concurrency,
+        )
+        stages["http_ask"] = await _load(
+            lambda i: client.get("/docs/ask", params={"q": questions[i], "top_k": 3}), n, concurrency,
+        )
+
+        sessions = []
+        for _ in range(concurrency):
+            response = await client.post("/chat/start")
+            response.raise_for_status()
+            sessions.append(response.json()["id"])
+        stages["http_chat_send"] = await _load(
+            lambda i: client.post("/chat/send", params={"session_id": sessions[i % concurrency], "message": questions[i]}),
+            n, concurrency,
+        )
+        for session_id in sessions:
+            await client.delete(f"/chat/{session_id}")
+
+
+async def _ingest_one(client: httpx.AsyncClient, path: str) -> str:
+    """Upload lewat /docs/process lalu tunggu job selesai; return doc_id."""
+    with open(path, "rb") as f:
+        response = await client.post("/docs/process", files={"file": (os.path.basename(path), f, PDF_MIME)})
+    response.raise_for_status()
+    accepted = response.json()
+    deadline = time.perf_counter() + INGEST_TIMEOUT_S
+    while time.perf_counter() < deadline:
+        job = (await client.get(f"/docs/jobs/{accepted['job_id']}")).json()
+        if job.get("stage") == "indexed":
+            return accepted["doc_id"]
+        if job.get("stage") == "failed":
+            raise RuntimeError(f"ingest failed: {job.get('error')}")
+        await asyncio.sleep(INGEST_POLL_S)
+    raise TimeoutError(f"ingest job {accepted['job_id']} not indexed after {INGEST_TIMEOUT_S}s")
+
+
+async def bench_ingest(base_url: str, path: str, pages: int, n: int, concurrency: int, stages: dict) -> None:
+    """
+    Ingestion end-to-end: upload /docs/process -> extract -> chunk -> embed ->
+    index oleh worker, diukur sampai status job `indexed` (termasuk antre).
+    Dokumen benchmark dihapus di akhir.
+    """
+    doc_ids: list[str] = []
+    samples: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(120.0)) as client:
+        async def one() -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    doc_ids.append(await _ingest_one(client, path))
+                except Exception:
+                    errors += 1
+                    return
+                samples.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        wall = time.perf_counter() - t0
+
+        for doc_id in doc_ids:
+            await client.delete(f"/docs/{doc_id}")
+
+    result = summarize(samples, items=pages * len(samples), wall_s=wall, unit="pages") if samples else {"count": 0}
+    result.update({"errors": errors, "concurrency": concurrency, "pages": pages})
+    stages["http_ingest"] = result
+
+
+# --- laporan -----------------------------------------------------------------
+
+def _git_sha() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def _meta(args: argparse.Namespace) -> dict:
+    settings = get_settings()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_sha": _git_sha(),
+        "settings": {
+            "EMBEDDING_MODEL": settings.EMBEDDING_MODEL,
+            "EMBEDDING_BACKEND": settings.EMBEDDING_BACKEND,
+            "EMBEDDING_BATCH_SIZE": settings.EMBEDDING_BATCH_SIZE,
+            "VECTOR_DB_MODE": settings.VECTOR_DB_MODE,
+            "CHUNK_SIZE": settings.CHUNK_SIZE,
+            "CHUNK_UNIT": settings.CHUNK_UNIT,
+        },
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # default di atas PDF_PARALLEL_MIN_PAGES supaya jalur ekstraksi paralel ikut terukur
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--pdf-small-pages", type=int, default=20, help="PDF di bawah threshold paralel")
+    parser.add_argument("--docx-paragraphs", type=int, default=300)
+    parser.add_argument("--csv-rows", type=int, default=3000)
+    parser.add_argument("--repeats", type=int, default=3, help="pengulangan extract/chunk")
+    parser.add_argument("--queries", type=int, default=100, help="query untuk stage vector_query")
+    parser.add_argument("--skip-offline", action="store_true")
+    parser.add_argument("--base-url", help="jalankan stage HTTP terhadap server ini")
+    parser.add_argument("--requests", type=int, default=100, help="request per endpoint HTTP")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ingest-docs", type=int, default=5, help="upload /docs/process (0 = lewati)")
+    parser.add_argument("--ingest-concurrency", type=int, default=2)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="batas regresi dalam persen")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    threshold = get_settings().PDF_PARALLEL_MIN_PAGES
+    if args.pdf_pages < threshold:
+        print(f"warning: --pdf-pages {args.pdf_pages} < PDF_PARALLEL_MIN_PAGES {threshold}, parallel extraction not measured")
+
+    stages: dict = {}
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        if not args.skip_offline:
+            files = make_corpus(workdir, args.pdf_pages, args.docx_paragraphs, args.csv_rows)
+            small = make_pdf(os.path.join(workdir, "bench_small.pdf"), args.pdf_small_pages, seed=1)
+            files.append({"kind": "pdf_small", "path": small, "mime": PDF_MIME, "bytes": os.path.getsize(small)})
+            texts = bench_extract(files, args.repeats, stages)
+            chunks = bench_chunk(texts, args.repeats, stages)
+            batches = bench_embed(chunks, get_settings().EMBEDDING_BATCH_SIZE, stages)
+            bench_vectors(chunks, batches, args.queries, stages)
+
+        if args.base_url:
+            asyncio.run(bench_http(args.base_url, args.requests, args.concurrency, stages))
+            if args.ingest_docs:
+                path = make_pdf(os.path.join(workdir, "bench_ingest.pdf"), args.pdf_pages, seed=2)
+                asyncio.run(bench_ingest(
+                    args.base_url, path, args.pdf_pages, args.ingest_docs, args.ingest_concurrency, stages,
+                ))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": _meta(args), "stages": stages}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["stages"], indent=2))
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        rows = compare(report, load_report(args.baseline), args.tolerance)
+        print(f"\nvs baseline {args.baseline} (tolerance {args.tolerance}%)")
+        print(format_table(rows))
+        regressions = [r for r in rows if r["status"] == "regression"]
+
+    if args.save_baseline:
+        shutil.copy(args.output, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99 dalam milidetik dari sampel durasi (detik)."""
+    arr = np.asarray(samples) * 1000
+    return {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in (50, 95, 99)}
+
+
+def summarize(samples: list[float], items: int = None, wall_s: float = None, unit: str = "items") -> dict:
+    """
+    Ringkasan satu stage: persentil latency per operasi + throughput.
+    `items` = jumlah unit kerja (mis. chunk) yang diproses dalam `wall_s`
+    detik; default satu unit per sampel dan wall = jumlah durasi.
+    """
+    wall_s = sum(samples) if wall_s is None else wall_s
+    items = len(samples) if items is None else items
+    return {
+        "count": len(samples),
+        "latency_ms": {**percentiles(samples), "mean": round(float(np.mean(samples)) * 1000, 3)},
+        "throughput": round(items / wall_s, 3) if wall_s else None,
+        "unit": f"{unit}/s",
+    }
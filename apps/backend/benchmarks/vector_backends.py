@@ -0,0 +1,121 @@
+"""
+Benchmark query vector store: Chroma (PersistentClient) vs NumpyCollection
+(float16 dan int8).
+
+Data sintetis (vector ter-normalisasi, dimensi MiniLM) di beberapa ukuran
+corpus. Untuk setiap backend diukur waktu build, latency query
+(p50/p95/p99, satu query per panggilan), recall@k terhadap exact search
+float32, dan ukuran penyimpanan vector dibanding float32.
+
+    cd apps/backend
+    python -m benchmarks.vector_backends --sizes 10000,50000,100000 --queries 200
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stats import percentiles
+from infra.db.numpy_index import NumpyCollection
+
+INSERT_BATCH = 5000
+
+
+def _random_unit(n: int, dim: int, rng: np.random.Generator, centers: np.ndarray = None) -> np.ndarray:
+    # vector di sekitar beberapa pusat (mirip topik), bukan noise murni,
+    # supaya tetangga terdekat cukup dekat seperti embedding sungguhan
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    if centers is not None:
+        x = centers[rng.integers(0, len(centers), n)] * 3 + x
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _recall(found: list[list[str]], truth: list[list[str]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return round(hits / sum(len(t) for t in truth), 4)
+
+
+def _run(collection, vectors: np.ndarray, queries: np.ndarray, top_k: int) -> dict:
+    ids = [f"c{i}" for i in range(len(vectors))]
+    t0 = time.perf_counter()
+    for s in range(0, len(vectors), INSERT_BATCH):
+        e = s + INSERT_BATCH
+        collection.upsert(
+            ids=ids[s:e],
+            embeddings=vectors[s:e],
+            documents=[f"chunk {i}" for i in range(s, min(e, len(vectors)))],
+            metadatas=[{"document_id": f"d{i // 50}"} for i in range(s, min(e, len(vectors)))],
+        )
+    build = time.perf_counter() - t0
+
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = collection.query(query_embeddings=q[None, :], n_results=top_k)
+        latencies.append(time.perf_counter() - t0)
+        found.append(res["ids"][0])
+
+    return {"build_s": round(build, 3), "latency_ms": percentiles(latencies), "found": found}
+
+
+def run_benchmark(sizes: list[int], n_queries: int, dim: int, top_k: int, seed: int = 0) -> list[dict]:
+    import chromadb
+
+    rng = np.random.default_rng(seed)
+    report = []
+    for size in sizes:
+        centers = rng.standard_normal((max(8, size // 500), dim)).astype(np.float32)
+        vectors = _random_unit(size, dim, rng, centers)
+        queries = _random_unit(n_queries, dim, rng, centers)
+        truth_idx = np.argsort(-(queries @ vectors.T), axis=1)[:, :top_k]
+        truth = [[f"c{i}" for i in row] for row in truth_idx]
+
+        workdir = tempfile.mkdtemp(prefix="vecbench_")
+        try:
+            chroma = chromadb.PersistentClient(path=f"{workdir}/chroma").get_or_create_collection(
+                "bench", metadata={"hnsw:space": "cosine"},
+            )
+            backends = {
+                "chroma": chroma,
+                "numpy_float16": NumpyCollection(f"{workdir}/numpy/f16", dtype="float16"),
+                "numpy_int8": NumpyCollection(f"{workdir}/numpy/i8", dtype="int8"),
+            }
+            float32_bytes = size * dim * 4
+            entry = {"size": size, "dim": dim, "top_k": top_k, "queries": n_queries, "float32_bytes": float32_bytes}
+            for name, collection in backends.items():
+                result = _run(collection, vectors, queries, top_k)
+                result["recall"] = _recall(result.pop("found"), truth)
+                result["recall_loss"] = round(1.0 - result["recall"], 4)
+                if isinstance(collection, NumpyCollection):
+                    # ukuran data terpakai (file bisa punya kapasitas cadangan)
+                    per_vector = collection.storage()["bytes_per_vector"]
+                    result["vector_bytes"] = per_vector * size
+                    result["compression"] = round(float32_bytes / (per_vector * size), 2)
+                entry[name] = result
+            report.append(entry)
+            print(json.dumps(entry), flush=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,50000,100000", help="ukuran corpus, pisahkan dengan koma")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", help="simpan laporan JSON ke file ini")
+    args = parser.parse_args()
+
+    report = run_benchmark([int(s) for s in args.sizes.split(",")], args.queries, args.dim, args.top_k)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
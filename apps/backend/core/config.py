@@ -9,21 +9,126 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str
     REDIS_URL: str
+    REDIS_SOCKET_TIMEOUT: float = 2.0
     VECTOR_DB_URL: str
+    VECTOR_DB_MODE: str = "local"  # "local" (embedded), "http" (server Chroma), "numpy" (mmap exact search)
+    CHROMA_PERSIST_DIR: str = "/data/chroma"
+    NUMPY_INDEX_DIR: str = "/data/vectors"
+    NUMPY_COMPACT_RATIO: float = 0.2  # compaction saat tombstone > 20% row
+    NUMPY_INDEX_DTYPE: str = "float16"  # float16 | int8 (skala per dimensi); berlaku untuk collection baru
+    VECTOR_HANDLE_TTL: float = 30.0  # detik, resolve ulang handle collection
+    VECTOR_POINTER_FILE: str = "/data/vector_pointers.json"  # salinan pointer terakhir, dipakai saat Redis down
     CORS_ORIGINS: str = "http://localhost:3000"
     
     UPLOAD_DIR: str = "/data/uploads"
     MAX_UPLOAD_MB: int = 25
+
+    # queue ingestion (Redis) + worker packages/embeddings/runner.py
+    INGEST_QUEUE: str = "ingest:queue"
+    INGEST_WORKERS: int = 2
+    INGEST_JOB_TTL: int = 7 * 24 * 3600  # detik
+    INGEST_BLOCK_TIMEOUT: int = 5  # detik, BLMOVE menunggu job
+    INGEST_HEARTBEAT_TTL: int = 30  # detik; job worker tanpa heartbeat dikembalikan ke queue
+
+    # reindex massal (shadow collection + checkpoint di Redis)
+    REINDEX_PAGE_SIZE: int = 100  # dokumen per query Postgres
+    REINDEX_BATCH_SIZE: int = 512  # chunk per panggilan encode
+    # model untuk shadow collection; kosong = EMBEDDING_MODEL. Query/ingestion
+    # live tetap memakai model collection live sampai swap.
+    REINDEX_EMBEDDING_MODEL: str | None = None
     ALLOWED_MIME: str = "application/pdf,application/vnd.openxmlformats-officedocument.wordprocessingml.document,text/csv"
+
+    # chunking (unit: "word" atau "token" tokenizer model embedding)
+    CHUNK_SIZE: int = 800
+    CHUNK_OVERLAP: int = 100
+    CHUNK_UNIT: str = "word"
+
+    # ekstraksi PDF paralel per range halaman
+    PDF_PARALLEL_MIN_PAGES: int = 64
+    PDF_EXTRACT_WORKERS: int = 0  # 0 = os.cpu_count() // INGEST_WORKERS (min 1)
     
     OPENAI_API_KEY: str | None = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
     LLM_PROVIDER: str = "openai"
+
+    # judul session otomatis (background, hanya di milestone jumlah pesan)
+    TITLE_MILESTONES: str = "2,10"
+    TITLE_EXCERPT_MESSAGES: int = 6
+    TITLE_EXCERPT_CHARS: int = 300
+
+    # memori percakapan: pesan terbaru verbatim dalam budget token, sisanya diringkas
+    MEMORY_RECENT_TOKENS: int = 1500
+    MEMORY_PENDING_TOKENS: int = 1000  # pesan di luar budget yang belum diringkas
+    MEMORY_MAX_RECENT_MESSAGES: int = 40
+    MEMORY_FOLD_MAX_MESSAGES: int = 40
+    MEMORY_SUMMARY_MAX_CHARS: int = 2000
+    # encoding tiktoken jika OPENAI_MODEL tidak dikenal (mis. provider ollama/custom)
+    MEMORY_TOKENIZER_ENCODING: str = "o200k_base"
+
+    # HTTP client LLM (pool per provider, keep-alive)
+    LLM_TIMEOUT: float = 60.0
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_MAX_CONNECTIONS: int = 200
+    LLM_MAX_KEEPALIVE: int = 50
+
+    OLLAMA_HOST: str = "http://localhost:11434"
+    OLLAMA_MODEL: str = "llama3"
+
+    # LLM_PROVIDER=stub: jawaban palsu dengan latency tetap (benchmark)
+    STUB_LLM_FIRST_TOKEN_MS: int = 300
+    STUB_LLM_TOKEN_MS: int = 20
+    STUB_LLM_TOKENS: int = 60
     
     # ⬅️ custom model provider
     CUSTOM_LLM_URL: str | None = None
     CUSTOM_LLM_TOKEN: str | None = None
     CUSTOM_LLM_MODEL: str = "Qwen2.5-7B"
 
+    # embedding model (dimuat sekali per proses)
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # model collection yang belum di-pin
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 2
+    # backend: torch (fp32) | onnx | onnx-int8 (dynamic quantization, CPU)
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_QUANT_CONFIG: str = "avx2"  # avx2 | avx512 | avx512_vnni | arm64
+    EMBEDDING_ONNX_DIR: str = "/data/models"  # hasil export int8 lokal
+    EMBEDDING_AGREEMENT_CHECK: bool = True
+    EMBEDDING_MIN_AGREEMENT: float = 0.99  # rata-rata cosine vs fp32
+
+    # cache embedding query (LRU in-process + Redis)
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_REDIS: bool = True
+    QUERY_CACHE_SIZE: int = 2048
+    QUERY_CACHE_TTL: int = 86400  # detik
+
+    # semantic answer cache untuk /docs/ask
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # cosine similarity minimum
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000  # per versi index
+    ANSWER_CACHE_TTL: int = 3600  # detik
+
+    # hybrid retrieval: full-text Postgres + vector, digabung dengan RRF
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20  # kandidat per retriever sebelum fusion
+    RRF_K: int = 60
+    LEXICAL_SEARCH_WORKERS: int = 4
+    LEXICAL_TIMEOUT_MS: int = 500  # lewat -> query itu pakai hasil vector saja
+    QUERY_BATCH_MAX: int = 64  # query per request POST /docs/query/batch
+
+    # rerank kandidat retrieval dengan cross-encoder (opsional)
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # multilingual
+    RERANK_CANDIDATES: int = 20
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_BUDGET_MS: int = 300  # lewat budget -> urutan retrieval dipakai
+    RERANK_MAX_PENDING: int = 4  # antrean job rerank; penuh -> langsung urutan retrieval
+    RERANK_CACHE_SIZE: int = 4096
+    RERANK_CACHE_TTL: int = 86400  # detik
+
+    # request di atas batas ini di-log beserta breakdown stage-nya
+    SLOW_REQUEST_MS: float = 1000.0
+
     class Config:
         env_file = ".env"
 
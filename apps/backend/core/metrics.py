@@ -0,0 +1,136 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from core.logger import logger
+
+STAGE_SECONDS = Histogram(
+    "app_stage_duration_seconds",
+    "Durasi per stage (db, embed, vector, lexical, rerank, llm, ...)",
+    ["stage"],
+)
+STAGE_ERRORS = Counter("app_stage_errors_total", "Exception di dalam stage", ["stage"])
+REQUEST_SECONDS = Histogram(
+    "app_http_request_duration_seconds",
+    "Durasi request HTTP sampai body terakhir terkirim",
+    ["method", "route", "status"],
+)
+REQUESTS = Counter("app_http_requests_total", "Jumlah request HTTP", ["method", "route", "status"])
+SLOW_REQUESTS = Counter("app_http_slow_requests_total", "Request di atas SLOW_REQUEST_MS", ["method", "route"])
+
+# daftar (stage, detik) milik request yang sedang berjalan; None di luar request
+_timings: ContextVar[list | None] = ContextVar("stage_timings", default=None)
+
+
+def record_stage(name: str, elapsed: float) -> None:
+    STAGE_SECONDS.labels(name).observe(elapsed)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Ukur satu stage: masuk histogram Prometheus dan, kalau dipanggil di dalam
+    request, ke breakdown Server-Timing / slow log request tersebut.
+    Bisa dipakai di kode sync maupun async (`with stage("llm"): await ...`).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def _breakdown(timings: list) -> dict[str, float]:
+    # stage yang terulang (mis. banyak query db) dijumlahkan, dalam ms
+    totals: dict[str, float] = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed * 1000
+    return totals
+
+
+def _server_timing(timings: list, total_ms: float) -> bytes:
+    parts = [f"{name};dur={ms:.1f}" for name, ms in _breakdown(timings).items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class StageTimingMiddleware:
+    """
+    ASGI middleware:
+    - header `Server-Timing` berisi stage yang selesai sebelum header dikirim
+      (untuk SSE, stage LLM berjalan setelahnya dan hanya masuk metrics/log)
+    - histogram + counter request per route template
+    - slow-request log dengan breakdown seluruh stage, termasuk background task
+    """
+
+    def __init__(self, app, slow_ms: float = 1000.0):
+        self.app = app
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+        finished = None
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, total_ms)))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            self._record(scope, status, (finished or time.perf_counter()) - start, timings)
+
+    def _record(self, scope, status: int, elapsed: float, timings: list) -> None:
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        method = scope["method"]
+        REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+        REQUESTS.labels(method, route, str(status)).inc()
+
+        if elapsed * 1000 >= self.slow_ms:
+            SLOW_REQUESTS.labels(method, route).inc()
+            stages = " ".join(f"{name}={ms:.1f}ms" for name, ms in _breakdown(timings).items())
+            logger.warning(
+                f"Slow request {method} {scope['path']} -> {status} "
+                f"{elapsed * 1000:.1f}ms [{stages or 'no stages'}]"
+            )
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    """Isi endpoint /metrics (gabungan semua worker jika PROMETHEUS_MULTIPROC_DIR di-set)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,12 @@
+import json
+
+# nonaktifkan buffering proxy (nginx) supaya token langsung sampai ke client
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data) -> str:
+    """Format satu Server-Sent Event. `data` di-encode JSON agar newline aman."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,216 @@
+from functools import lru_cache
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from core.config import get_settings
+from core.logger import logger
+from domain.chat import models
+from domain.chat.prompt_template import build_summary_prompt
+from domain.documents.llm_client import generate_answer
+from infra.db.postgres import SessionLocal
+from infra.db.redis import get_redis
+
+# fallback kalau tiktoken tidak tersedia: perkiraan kasar token BPE dari karakter
+CHARS_PER_TOKEN = 4
+SUMMARY_LOCK_TTL = 300  # detik
+
+
+@lru_cache
+def _token_encoder():
+    """
+    Tokenizer tiktoken untuk OPENAI_MODEL (model lain/tak dikenal memakai
+    MEMORY_TOKENIZER_ENCODING). None jika tiktoken tidak terpasang atau file
+    encoding tidak bisa dimuat -> count_tokens jatuh ke perkiraan karakter.
+    """
+    settings = get_settings()
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken not installed, memory budget uses character estimate")
+        return None
+    try:
+        try:
+            enc = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+        except KeyError:
+            enc = tiktoken.get_encoding(settings.MEMORY_TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, memory budget uses character estimate: {e}")
+        return None
+    return enc
+
+
+def count_tokens(text: str) -> int:
+    enc = _token_encoder()
+    if enc is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return max(1, len(enc.encode(text, disallowed_special=())))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Potong `text` menjadi paling banyak `max_tokens` token (awal teks dipertahankan)."""
+    enc = _token_encoder()
+    if enc is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+
+
+def format_message(msg) -> str:
+    return f"{msg.role.upper()}: {msg.content}"
+
+
+def _unsummarized(db: Session, session: models.ChatSession, limit: int, newest_first: bool = True, before=None):
+    """Pesan yang belum masuk ringkasan (setelah summary_until)."""
+    q = db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session.id)
+    if session.summary_until is not None:
+        q = q.filter(models.ChatMessage.created_at > session.summary_until)
+    if before is not None:
+        q = q.filter(models.ChatMessage.created_at < before)
+    order = models.ChatMessage.created_at.desc() if newest_first else models.ChatMessage.created_at.asc()
+    return q.order_by(order).limit(limit).all()
+
+
+def _split_by_budget(newest_first: list, budget: int) -> tuple[list, list]:
+    """
+    Pisahkan pesan (urut terbaru dulu) menjadi (verbatim, overflow).
+    Pesan terbaru selalu masuk verbatim walaupun melebihi budget.
+    """
+    used = 0
+    for i, msg in enumerate(newest_first):
+        used += count_tokens(format_message(msg))
+        if used > budget and i > 0:
+            return newest_first[:i], newest_first[i:]
+    return newest_first, []
+
+
+def _fit_pending(newest_first: list, budget: int) -> list[str]:
+    """
+    Baris pesan pending (urut terbaru dulu) dalam `budget` token: pesan yang
+    melewati sisa budget dipotong, pesan yang lebih tua dibuang.
+    """
+    lines, left = [], budget
+    for msg in newest_first:
+        if left <= 0:
+            break
+        line = format_message(msg)
+        cost = count_tokens(line)
+        if cost > left:
+            line = truncate_tokens(line, left) + " ..."
+        lines.append(line)
+        left -= cost
+    return lines
+
+
+def build_history(db: Session, session: models.ChatSession) -> dict:
+    """
+    Context window percakapan dengan budget token:
+    ringkasan bergulir (pesan lama) + pesan terbaru verbatim.
+
+    Pesan di luar budget verbatim yang belum masuk ringkasan (fold berjalan
+    di background) tetap ikut di prompt sampai summary_until menutupinya,
+    dalam budget token sendiri (MEMORY_PENDING_TOKENS): yang terbaru
+    didahulukan, yang paling tua dipotong/dibuang jika ringkasan tertinggal.
+    Di luar ringkasan (maks MEMORY_SUMMARY_MAX_CHARS), history per turn
+    paling banyak MEMORY_RECENT_TOKENS + MEMORY_PENDING_TOKENS token (pesan
+    terbaru selalu masuk utuh walaupun melebihi budget).
+    """
+    settings = get_settings()
+    window = settings.MEMORY_MAX_RECENT_MESSAGES + settings.MEMORY_FOLD_MAX_MESSAGES
+    unsummarized = _unsummarized(db, session, window)
+    recent = unsummarized[:settings.MEMORY_MAX_RECENT_MESSAGES]
+    verbatim, _ = _split_by_budget(recent, settings.MEMORY_RECENT_TOKENS)
+    pending = unsummarized[len(verbatim):]
+    if len(unsummarized) == window:
+        logger.warning(f"Session {session.id}: summary is {window}+ messages behind, older turns may be omitted")
+
+    lines = []
+    if session.summary:
+        lines.append(f"RINGKASAN PERCAKAPAN SEBELUMNYA:\n{session.summary}\n")
+    lines.extend(reversed(_fit_pending(pending, settings.MEMORY_PENDING_TOKENS)))
+    lines.extend(format_message(m) for m in reversed(verbatim))
+
+    total = (
+        db.query(func.count(models.ChatMessage.id))
+        .filter(models.ChatMessage.session_id == session.id)
+        .scalar()
+    )
+
+    return {
+        "history_text": "\n".join(lines),
+        "message_count": total,
+        # ada pesan lama yang belum masuk ringkasan -> perlu di-fold
+        "needs_summary": bool(pending),
+    }
+
+
+def _load_fold_batch(session_id: str) -> dict | None:
+    """Ambil pesan tertua yang sudah keluar dari budget verbatim untuk di-fold."""
+    settings = get_settings()
+    with SessionLocal() as db:
+        session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
+        if not session:
+            return None
+
+        recent = _unsummarized(db, session, settings.MEMORY_MAX_RECENT_MESSAGES)
+        verbatim, _ = _split_by_budget(recent, settings.MEMORY_RECENT_TOKENS)
+        if not verbatim:
+            return None
+
+        # semua pesan yang lebih tua dari pesan verbatim tertua
+        fold = _unsummarized(
+            db, session, settings.MEMORY_FOLD_MAX_MESSAGES,
+            newest_first=False, before=verbatim[-1].created_at,
+        )
+        if not fold:
+            return None
+
+        return {
+            "previous": session.summary or "",
+            "conversation": "\n".join(format_message(m) for m in fold),
+            "until": fold[-1].created_at,
+        }
+
+
+def _save_summary(session_id: str, summary: str, until) -> None:
+    settings = get_settings()
+    with SessionLocal() as db:
+        session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
+        if session:
+            session.summary = summary[:settings.MEMORY_SUMMARY_MAX_CHARS]
+            session.summary_until = until
+            db.commit()
+
+
+async def refresh_session_summary(session_id: str) -> None:
+    """
+    Fold pesan lama ke ringkasan bergulir milik ChatSession (incremental:
+    ringkasan lama + potongan pesan berikutnya). Background task.
+    """
+    lock_key = f"chat:summary-lock:{session_id}"
+    try:
+        # Redis sync -> threadpool, supaya Redis yang lambat tidak menahan event loop
+        if not await run_in_threadpool(get_redis().set, lock_key, "1", nx=True, ex=SUMMARY_LOCK_TTL):
+            return
+    except Exception as e:
+        logger.warning(f"Summary lock unavailable, skipping: {e}")
+        return
+
+    try:
+        batch = await run_in_threadpool(_load_fold_batch, session_id)
+        if not batch:
+            return
+        summary = await generate_answer(
+            build_summary_prompt(batch["previous"], batch["conversation"]),
+            stage_name="llm_summary",
+        )
+        if summary and summary.strip():
+            await run_in_threadpool(_save_summary, session_id, summary.strip(), batch["until"])
+    except Exception as e:
+        logger.error(f"Summary refresh failed for session {session_id}: {e}")
+    finally:
+        try:
+            await run_in_threadpool(get_redis().delete, lock_key)
+        except Exception:
+            pass
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from infra.db.base import Base
@@ -10,11 +10,18 @@ class ChatSession(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)  # ringkasan bergulir pesan lama
+    summary_until = Column(DateTime(timezone=True), nullable=True)  # created_at pesan terakhir di ringkasan
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     messages = relationship("ChatMessage", cascade="all, delete-orphan", backref="session")
 
+    __table_args__ = (
+        # listing session (keyset: updated_at, id)
+        Index("ix_chat_sessions_updated_at_id", "updated_at", "id"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -23,3 +30,8 @@ class ChatMessage(Base):
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # history per session + keyset pagination (created_at, id)
+        Index("ix_chat_messages_session_created_id", "session_id", "created_at", "id"),
+    )
@@ -0,0 +1,45 @@
+def build_chat_prompt(history_text: str, context_text: str, message: str) -> str:
+    return f"""
+    Ini percakapan sebelumnya:
+
+    {history_text}
+
+    Gunakan konteks ini untuk menjawab user:
+
+    {context_text}
+
+    Pertanyaan user:
+    {message}
+
+    Jawab singkat dan jelas dalam bahasa Indonesia.
+    """
+
+
+def build_ask_prompt(context: str, question: str) -> str:
+    return f"""
+    Gunakan konteks berikut untuk menjawab pertanyaan.
+
+    KONTEKS:
+    {context}
+
+    PERTANYAAN:
+    {question}
+
+    Jawab dengan jelas dan ringkas dalam bahasa Indonesia.
+    """
+
+
+def build_summary_prompt(previous_summary: str, conversation_text: str) -> str:
+    return f"""
+    Perbarui ringkasan percakapan berikut dengan pesan-pesan baru di bawahnya.
+    Pertahankan fakta penting, keputusan, dan pertanyaan yang belum terjawab.
+    Maksimal 200 kata.
+
+    Ringkasan sebelumnya:
+    {previous_summary or "(belum ada)"}
+
+    Pesan baru:
+    {conversation_text}
+
+    Output hanya ringkasan terbarunya saja.
+    """
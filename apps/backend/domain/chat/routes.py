@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from infra.db.postgres import get_db
+from infra.db.postgres import get_db, SessionLocal
+from infra.db.pagination import keyset_page, get_pivot
 from domain.chat import models, schemas
-from domain.documents.embedder import get_client
-from sentence_transformers import SentenceTransformer
-from domain.documents.llm_client import generate_answer
-from domain.chat.title_generator import generate_session_title
+from domain.chat.memory import refresh_session_summary
+from domain.chat.service import prepare_turn, save_assistant_message, update_session_title, is_title_milestone
+from domain.documents.llm_client import generate_answer, stream_answer
+from core.logger import logger
+from core.sse import sse_event, SSE_HEADERS
+import anyio
+import asyncio
 import uuid
 
 router = APIRouter(prefix="/chat", tags=["chat"])
+_detached: set[asyncio.Task] = set()  # referensi task detached supaya tidak di-GC
 
 @router.post("/start", response_model=schemas.ChatSessionOut)
 def start_chat(db: Session = Depends(get_db)):
@@ -18,101 +25,98 @@ def start_chat(db: Session = Depends(get_db)):
     db.refresh(session)
     return session
 
-@router.post("/send")
-def send_message(session_id: str, message: str, db: Session = Depends(get_db)):
-
-    # 1. Pastikan session valid
-    session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    # 2. Simpan pesan user
-    user_msg = models.ChatMessage(
-        session_id=session_id,
-        role="user",
-        content=message
-    )
-    db.add(user_msg)
-    db.commit()
-    
-    # --- RENAME SESSION AUTOMATIS (pesan pertama) ---
-    if session.title is None or session.title == "":
-        session.title = message[:60]
-        db.commit()
-
-    # --- AUTO SUMMARY TITLE (LLM) ---
-    # Kita update title hanya jika pesan sudah 2 atau lebih
-    all_messages = (
-        db.query(models.ChatMessage)
-        .filter(models.ChatMessage.session_id == session_id)
-        .order_by(models.ChatMessage.created_at.asc())
-        .all()
-    )
-
-    if len(all_messages) >= 2:
-        text_messages = [m.content for m in all_messages]
-        new_title = generate_session_title(text_messages)
-
-        if new_title and new_title.strip():
-            session.title = new_title[:60]
-            db.commit()
-
-    # 3. Ambil seluruh history (10 terakhir)
-    history = db.query(models.ChatMessage) \
-                .filter(models.ChatMessage.session_id == session_id) \
-                .order_by(models.ChatMessage.created_at.asc()) \
-                .all()
-
-    history_text = ""
-    for msg in history:
-        history_text += f"{msg.role.upper()}: {msg.content}\n"
-
-    # 4. RAG — ambil chunk paling relevan
-    client = get_client("/data/chroma")
-    collection = client.get_or_create_collection("documents")
-
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    query_emb = model.encode([message], convert_to_numpy=True).tolist()[0]
-
-    results = collection.query(query_embeddings=[query_emb], n_results=3)
-    contexts = results.get("documents", [[]])[0]
-    context_text = "\n\n".join(contexts)
-
-    # 5. Build final prompt
-    prompt = f"""
-    Ini percakapan sebelumnya:
-
-    {history_text}
+def _schedule_background(background_tasks: BackgroundTasks, session_id: str, turn: dict) -> None:
+    # jumlah pesan setelah jawaban AI tersimpan
+    if is_title_milestone(turn["memory_count"] + 1):
+        background_tasks.add_task(update_session_title, session_id)
+    # pesan lama yang keluar dari budget di-fold ke ringkasan session
+    if turn["needs_summary"]:
+        background_tasks.add_task(refresh_session_summary, session_id)
 
-    Gunakan konteks ini untuk menjawab user:
-
-    {context_text}
-
-    Pertanyaan user:
-    {message}
-
-    Jawab singkat dan jelas dalam bahasa Indonesia.
-    """
+@router.post("/send")
+async def send_message(
+    session_id: str,
+    message: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    # DB + vector store masih sync -> threadpool; LLM call async (tidak memegang thread)
+    turn = await run_in_threadpool(prepare_turn, db, session_id, message)
 
     # 6. Panggil LLM (OpenAI / Ollama / Custom)
-    answer = generate_answer(prompt)
+    answer = await generate_answer(turn["prompt"])
 
     # 7. Simpan jawaban AI
-    ai_msg = models.ChatMessage(
-        session_id=session_id,
-        role="assistant",
-        content=answer
-    )
-    db.add(ai_msg)
-    db.commit()
+    await run_in_threadpool(save_assistant_message, db, session_id, answer)
+
+    # 8. Judul + ringkasan session di-update setelah response terkirim
+    _schedule_background(background_tasks, session_id, turn)
 
     return {
         "session_id": session_id,
         "answer": answer,
-        "memory_count": len(history),
-        "context_used": contexts
+        "memory_count": turn["memory_count"],
+        "context_used": turn["contexts"]
     }
 
+def _save_streamed_answer(session_id: str, answer: str) -> None:
+    # session dari Depends sudah ditutup saat body di-stream
+    with SessionLocal() as db:
+        save_assistant_message(db, session_id, answer)
+
+def _run_detached(tasks: BackgroundTasks) -> None:
+    """
+    Jalankan background task di luar cancel scope response: saat client
+    disconnect, stream dibatalkan tetapi judul/ringkasan tetap diperbarui.
+    """
+    task = asyncio.create_task(tasks())
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+
+@router.post("/send/stream")
+async def send_message_stream(
+    session_id: str,
+    message: str,
+    db: Session = Depends(get_db),
+):
+    """
+    Sama seperti /send tetapi jawaban dikirim sebagai Server-Sent Events:
+    `meta` (konteks) -> `token` (berulang) -> `done`.
+    Jawaban disimpan saat stream selesai atau saat client disconnect, lalu
+    judul + ringkasan session dijadwalkan dari blok yang sama.
+    """
+    turn = await run_in_threadpool(prepare_turn, db, session_id, message)
+    # bukan BackgroundTasks milik request: itu tidak jalan kalau client disconnect
+    tasks = BackgroundTasks()
+    _schedule_background(tasks, session_id, turn)
+
+    async def event_stream():
+        parts: list[str] = []
+        try:
+            yield sse_event("meta", {
+                "session_id": session_id,
+                "memory_count": turn["memory_count"],
+                "context_used": turn["contexts"],
+            })
+            async for token in stream_answer(turn["prompt"]):
+                parts.append(token)
+                yield sse_event("token", token)
+            yield sse_event("done", {"answer": "".join(parts)})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse_event("error", {"detail": "LLM stream failed"})
+        finally:
+            # shield: saat disconnect scope response sudah dibatalkan
+            with anyio.CancelScope(shield=True):
+                if parts:
+                    try:
+                        await run_in_threadpool(_save_streamed_answer, session_id, "".join(parts))
+                    except Exception as e:
+                        logger.error(f"Saving streamed answer failed for session {session_id}: {e}")
+            _run_detached(tasks)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.delete("/{session_id}")
 def delete_session(session_id: str, db: Session = Depends(get_db)):
     session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
@@ -126,13 +130,31 @@ def delete_session(session_id: str, db: Session = Depends(get_db)):
     return {"message": f"Session {session_id} deleted successfully"}
 
 @router.get("/sessions")
-def list_sessions(db: Session = Depends(get_db)):
-    sessions = (
-        db.query(models.ChatSession)
-        .order_by(models.ChatSession.updated_at.desc())
-        .all()
+def list_sessions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = Query(None, description="Cursor: id session terakhir di halaman sebelumnya"),
+    after: str | None = Query(None, description="Cursor: id session pertama, ambil yang lebih baru"),
+    db: Session = Depends(get_db),
+):
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after")
+
+    sort_cols = [models.ChatSession.updated_at, models.ChatSession.id]
+    pivot = get_pivot(db, models.ChatSession, sort_cols, before or after)
+    sessions = keyset_page(
+        db.query(models.ChatSession),
+        sort_cols,
+        pivot,
+        limit,
+        before=pivot is None or before is not None,
+        newest_first=True,
     )
 
+    # cursor halaman berikutnya (lebih lama), kalau halaman penuh
+    if len(sessions) == limit:
+        response.headers["X-Next-Before"] = str(sessions[-1].id)
+
     return [
         {
             "id": str(s.id),
@@ -144,23 +166,41 @@ def list_sessions(db: Session = Depends(get_db)):
     ]
 
 @router.get("/{session_id}/messages")
-def get_session_messages(session_id: str, db: Session = Depends(get_db)):
+def get_session_messages(
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    before: str | None = Query(None, description="Cursor: id pesan, ambil pesan yang lebih lama"),
+    after: str | None = Query(None, description="Cursor: id pesan, ambil pesan yang lebih baru"),
+    db: Session = Depends(get_db),
+):
     session = (
-        db.query(models.ChatSession)
+        db.query(models.ChatSession.id)
         .filter(models.ChatSession.id == session_id)
         .first()
     )
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-
-    messages = (
-        db.query(models.ChatMessage)
-        .filter(models.ChatMessage.session_id == session_id)
-        .order_by(models.ChatMessage.created_at.asc())
-        .all()
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after")
+
+    # default: `limit` pesan terbaru, tetap urut kronologis (asc)
+    sort_cols = [models.ChatMessage.created_at, models.ChatMessage.id]
+    pivot = get_pivot(db, models.ChatMessage, sort_cols, before or after)
+    messages = keyset_page(
+        db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session_id),
+        sort_cols,
+        pivot,
+        limit,
+        before=pivot is None or before is not None,
+        newest_first=False,
     )
 
+    # cursor untuk memuat pesan yang lebih lama
+    if len(messages) == limit:
+        response.headers["X-Next-Before"] = str(messages[0].id)
+
     return [
         {
             "id": str(m.id),
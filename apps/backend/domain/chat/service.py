@@ -0,0 +1,138 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from core.config import get_settings
+from core.logger import logger
+from domain.chat import models
+from domain.chat.memory import build_history
+from domain.chat.prompt_template import build_chat_prompt
+from domain.chat.title_generator import generate_session_title
+from infra.db.postgres import SessionLocal
+from infra.db.redis import get_redis
+from domain.documents.retrieval import hybrid_search
+
+TITLE_LOCK_TTL = 120  # detik
+
+
+def prepare_turn(db: Session, session_id: str, message: str) -> dict:
+    """
+    Simpan pesan user, update judul awal, lalu siapkan prompt RAG.
+    Dipakai bersama oleh /chat/send dan /chat/send/stream (di threadpool,
+    karena akses DB dan vector store masih sync).
+    """
+    # 1. Pastikan session valid
+    session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    # 2. Simpan pesan user
+    user_msg = models.ChatMessage(
+        session_id=session_id,
+        role="user",
+        content=message
+    )
+    db.add(user_msg)
+    db.commit()
+
+    # --- RENAME SESSION AUTOMATIS (pesan pertama) ---
+    if session.title is None or session.title == "":
+        session.title = message[:60]
+        db.commit()
+
+    # 3. History dengan budget token (ringkasan + pesan terbaru verbatim)
+    memory = build_history(db, session)
+
+    # 4. RAG — ambil chunk paling relevan (hybrid lexical + vector)
+    contexts = [hit["text"] for hit in hybrid_search(message, 3)]
+    context_text = "\n\n".join(contexts)
+
+    # 5. Build final prompt
+    return {
+        "prompt": build_chat_prompt(memory["history_text"], context_text, message),
+        "contexts": contexts,
+        "memory_count": memory["message_count"],
+        "needs_summary": memory["needs_summary"],
+    }
+
+
+def save_assistant_message(db: Session, session_id: str, answer: str) -> models.ChatMessage:
+    ai_msg = models.ChatMessage(
+        session_id=session_id,
+        role="assistant",
+        content=answer
+    )
+    db.add(ai_msg)
+    db.commit()
+    return ai_msg
+
+
+def title_milestones() -> set[int]:
+    raw = get_settings().TITLE_MILESTONES
+    return {int(x) for x in raw.split(",") if x.strip()}
+
+
+def is_title_milestone(message_count: int) -> bool:
+    """Judul LLM hanya dibuat ulang di jumlah pesan tertentu (mis. 2 dan 10)."""
+    return message_count in title_milestones()
+
+
+def _load_title_excerpt(session_id: str) -> list[str]:
+    """
+    Potongan percakapan terbatas (TITLE_EXCERPT_MESSAGES pesan, masing-masing
+    dipotong): separuh pesan pertama (topik awal) + sisanya pesan terbaru,
+    supaya judul di milestone berikutnya mengikuti arah percakapan.
+    """
+    settings = get_settings()
+    limit = settings.TITLE_EXCERPT_MESSAGES
+    with SessionLocal() as db:
+        q = (
+            db.query(models.ChatMessage.id, models.ChatMessage.content)
+            .filter(models.ChatMessage.session_id == session_id)
+        )
+        first = q.order_by(models.ChatMessage.created_at.asc()).limit((limit + 1) // 2).all()
+        latest = q.order_by(models.ChatMessage.created_at.desc()).limit(limit - len(first)).all()
+    seen = {r.id for r in first}
+    rows = first + [r for r in reversed(latest) if r.id not in seen]
+    return [r.content[:settings.TITLE_EXCERPT_CHARS] for r in rows]
+
+
+async def update_session_title(session_id: str) -> None:
+    """
+    AUTO SUMMARY TITLE (LLM). Dijalankan sebagai background task setelah
+    jawaban dikirim; lock Redis mencegah dua generate berjalan bersamaan
+    untuk session yang sama.
+    """
+    lock_key = f"chat:title-lock:{session_id}"
+    try:
+        # Redis sync -> threadpool, supaya Redis yang lambat tidak menahan event loop
+        if not await run_in_threadpool(get_redis().set, lock_key, "1", nx=True, ex=TITLE_LOCK_TTL):
+            return
+    except Exception as e:
+        logger.warning(f"Title lock unavailable, skipping title update: {e}")
+        return
+
+    try:
+        messages = await run_in_threadpool(_load_title_excerpt, session_id)
+        if len(messages) < 2:
+            return
+
+        new_title = await generate_session_title(messages)
+        if not new_title or not new_title.strip():
+            return
+
+        def _save():
+            with SessionLocal() as db:
+                session = db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
+                if session:
+                    session.title = new_title[:60]
+                    db.commit()
+
+        await run_in_threadpool(_save)
+    except Exception as e:
+        logger.error(f"Title generation failed for session {session_id}: {e}")
+    finally:
+        try:
+            await run_in_threadpool(get_redis().delete, lock_key)
+        except Exception:
+            pass
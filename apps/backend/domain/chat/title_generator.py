@@ -1,6 +1,6 @@
 from domain.documents.llm_client import generate_answer
 
-def generate_session_title(messages: list[str]) -> str:
+async def generate_session_title(messages: list[str]) -> str:
     """
     Generates a short title using the LLM based on the chat messages.
     """
@@ -17,7 +17,7 @@ def generate_session_title(messages: list[str]) -> str:
     """
 
     try:
-        title = generate_answer(prompt)
+        title = await generate_answer(prompt, stage_name="llm_title")
         return title.strip()
     except Exception:
         # fallback supaya tidak error
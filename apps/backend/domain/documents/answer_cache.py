@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from core.config import get_settings
+from core.logger import logger
+from infra.db.redis import get_redis
+
+
+class SemanticAnswerCache:
+    """
+    Cache jawaban /docs/ask berdasarkan kemiripan embedding pertanyaan.
+
+    Entry disimpan di Redis list `anscache:{index_version}`; karena key memuat
+    versi index, jawaban lama otomatis tidak terpakai lagi begitu ada upload,
+    embed, atau delete. Setiap proses menyimpan mirror (matrix embedding
+    ter-normalisasi) dan hanya menarik entry baru dari Redis. Jika list di
+    Redis kedaluwarsa / dibuat ulang (elemen pertama berubah), mirror
+    di-reset; entry lokal yang lebih tua dari `ttl` tidak dipakai lagi.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl: int = 3600, redis_client=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis_client
+        self._lock = threading.Lock()
+        self._version: int | None = None
+        self._vectors: np.ndarray | None = None
+        self._entries: list[dict] = []
+        self._synced = 0
+        self._head: bytes | None = None  # elemen pertama list Redis yang di-mirror
+
+    @staticmethod
+    def _key(version: int) -> str:
+        return f"anscache:{version}"
+
+    @staticmethod
+    def _normalize(emb) -> np.ndarray:
+        vec = np.asarray(emb, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _reset(self, version: int) -> None:
+        self._version = version
+        self._vectors = None
+        self._entries = []
+        self._synced = 0
+        self._head = None
+
+    def _append_local(self, entries: list[dict]) -> None:
+        if not entries:
+            return
+        new_vecs = np.stack([self._normalize(e["embedding"]) for e in entries])
+        self._vectors = new_vecs if self._vectors is None else np.vstack([self._vectors, new_vecs])
+        for e in entries:
+            self._entries.append({k: v for k, v in e.items() if k != "embedding"})
+
+    def _sync(self, version: int) -> None:
+        # dipanggil dengan self._lock dipegang
+        if self._version != version:
+            self._reset(version)
+        if self.redis is None:
+            return
+        key = self._key(version)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lindex(key, 0)
+            pipe.lrange(key, self._synced, -1)
+            head, raw = pipe.execute()
+            if self._synced and head != self._head:
+                # list kedaluwarsa (ANSWER_CACHE_TTL) lalu mungkin diisi ulang proses lain
+                self._reset(version)
+                raw = self.redis.lrange(key, 0, -1)
+        except Exception as e:
+            logger.warning(f"Answer cache redis sync failed: {e}")
+            return
+        if raw and not self._synced:
+            self._head = raw[0]
+        self._append_local([json.loads(r) for r in raw])
+        self._synced += len(raw)
+
+    def lookup(self, query_emb, top_k: int, version: int) -> dict | None:
+        with self._lock:
+            self._sync(version)
+            if self._vectors is None:
+                return None
+
+            sims = self._vectors @ self._normalize(query_emb)
+            oldest = time.time() - self.ttl
+            for idx in np.argsort(-sims):
+                score = float(sims[idx])
+                if score < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry.get("created_at", 0) < oldest:
+                    continue
+                if entry["top_k"] == top_k:
+                    return {**entry, "similarity": round(score, 4)}
+        return None
+
+    def store(self, question: str, query_emb, top_k: int, answer: str, context_used: list[str], version: int) -> None:
+        entry = {
+            "question": question,
+            "embedding": [float(x) for x in query_emb],
+            "top_k": top_k,
+            "answer": answer,
+            "context_used": context_used,
+            "created_at": time.time(),
+        }
+
+        with self._lock:
+            if self._version != version:
+                self._reset(version)
+
+            if self.redis is None:
+                if len(self._entries) < self.max_entries:
+                    self._append_local([entry])
+                return
+
+            key = self._key(version)
+            try:
+                if self.redis.llen(key) >= self.max_entries:
+                    return
+                pipe = self.redis.pipeline()
+                pipe.rpush(key, json.dumps(entry))
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Answer cache redis store failed: {e}")
+                if len(self._entries) < self.max_entries:
+                    self._append_local([entry])
+
+
+@lru_cache
+def get_answer_cache() -> SemanticAnswerCache:
+    settings = get_settings()
+    return SemanticAnswerCache(
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl=settings.ANSWER_CACHE_TTL,
+        redis_client=get_redis(),
+    )
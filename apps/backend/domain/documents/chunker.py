@@ -0,0 +1,124 @@
+import hashlib
+import re
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+from core.config import get_settings
+
+WORD_RE = re.compile(r"\S+")
+LINE_RE = re.compile(r"[^\n]+")
+MIN_FILL = 0.5     # chunk minimal setengah chunk_size sebelum boleh ditutup di anchor
+ANCHOR_RATE = 4    # ~4 anchor per chunk_size unit -> rata-rata chunk ~0.75 chunk_size
+
+
+def _token_counter() -> Callable[[str], int]:
+    # tokenizer model embedding aktif, supaya ukuran chunk sesuai batas model
+    from infra.llm.embedder import get_embedder
+
+    tokenizer = get_embedder().load().tokenizer
+    return lambda word: max(1, len(tokenizer.tokenize(word)))
+
+
+def _is_anchor(line: str, cost: int, chunk_size: int) -> bool:
+    """
+    Batas chunk ditentukan isi baris itu sendiri (hash stabil antar proses),
+    dengan peluang sebanding panjang baris: rata-rata satu anchor per
+    chunk_size / ANCHOR_RATE unit.
+    """
+    digest = hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % chunk_size < ANCHOR_RATE * cost
+
+
+def iter_chunks(
+    pages: Iterable[dict],
+    chunk_size: int = None,
+    overlap: int = None,
+    unit: str = None,
+) -> Iterator[dict]:
+    """
+    Chunker streaming: membaca teks per halaman dan yield chunk satu per satu.
+
+    `pages` = iterable {"page": n, "text": ...} (mis. dari extractor.iter_pages).
+    Ukuran chunk dihitung dalam kata (`unit="word"`) atau token model
+    embedding (`unit="token"`). Memori yang dipakai hanya sebesar satu
+    halaman + satu chunk, berapa pun ukuran dokumennya.
+
+    Batas chunk di-anchor ke akhir halaman / baris (paragraf), bukan ke
+    offset kata global: setelah chunk terisi MIN_FILL, chunk ditutup di akhir
+    halaman atau di akhir baris yang lolos `_is_anchor`; chunk_size hanya
+    batas atas. Karena batas ditentukan isi lokal, sisipan/hapusan teks
+    hanya mengubah chunk di sekitarnya, dan chunk lain (beserta hash/id-nya)
+    tetap sama sehingga tidak perlu di-embed ulang.
+
+    Setiap chunk membawa posisi sumbernya:
+    - page / page_end       : halaman awal dan akhir chunk
+    - char_start / char_end : offset karakter di page / page_end
+    """
+    if chunk_size is None or overlap is None or unit is None:
+        settings = get_settings()
+        chunk_size = chunk_size or settings.CHUNK_SIZE
+        overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+        unit = unit or settings.CHUNK_UNIT
+    if overlap >= chunk_size:
+        raise ValueError("overlap harus lebih kecil dari chunk_size")
+    min_fill = max(int(chunk_size * MIN_FILL), overlap + 1)
+
+    if unit == "word":
+        cost_of = lambda word: 1  # noqa: E731
+    elif unit == "token":
+        cost_of = _token_counter()
+    else:
+        raise ValueError(f"Unit chunk tidak dikenal: {unit}")
+
+    # buffer: (word, page, start, end, cost)
+    buf: deque = deque()
+    total = 0
+    fresh = 0  # kata baru sejak chunk terakhir
+    index = 0
+
+    def make_chunk() -> dict:
+        first, last = buf[0], buf[-1]
+        return {
+            "index": index,
+            "text": " ".join(w[0] for w in buf),
+            "page": first[1],
+            "page_end": last[1],
+            "char_start": first[2],
+            "char_end": last[3],
+        }
+
+    def cut() -> dict:
+        nonlocal index, fresh, total
+        chunk = make_chunk()
+        index += 1
+        fresh = 0
+        # sisakan ekor sebesar overlap untuk chunk berikutnya
+        keep, kept = 0, 0
+        for w in reversed(buf):
+            if kept + w[4] > overlap:
+                break
+            kept += w[4]
+            keep += 1
+        while len(buf) > keep:
+            total -= buf.popleft()[4]
+        return chunk
+
+    for page in pages:
+        text = page["text"]
+        for line in LINE_RE.finditer(text):
+            line_cost = 0
+            for m in WORD_RE.finditer(text, line.start(), line.end()):
+                cost = cost_of(m.group())
+                buf.append((m.group(), page["page"], m.start(), m.end(), cost))
+                total += cost
+                line_cost += cost
+                fresh += 1
+                if total >= chunk_size:
+                    yield cut()  # baris sangat panjang / tidak ada anchor
+            if fresh and total >= min_fill and _is_anchor(line.group(), line_cost, chunk_size):
+                yield cut()
+        if fresh and total >= min_fill:
+            yield cut()
+
+    if buf and fresh:
+        yield make_chunk()
@@ -1,59 +1,237 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
+import hashlib
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
 import numpy as np
-import textwrap
+from core.config import get_settings
+from infra.llm.embedder import embed_batch, get_embedder
+from infra.db.vector_store import get_collection, get_vector_store
+from domain.documents.index_version import bump_index_version
+from domain.documents.chunker import iter_chunks
+from domain.documents.lexical import prune_lexical_chunks, upsert_lexical_chunks
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100):
-    words = text.split()
-    chunks, start = [], 0
-    while start < len(words):
-        end = min(start + chunk_size, len(words))
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+def chunk_text(text: str, chunk_size: int = None, overlap: int = None) -> list[str]:
+    return [c["text"] for c in iter_chunks([{"page": 1, "text": text}], chunk_size, overlap)]
 
-def get_client(persist_dir: str = "/data/chroma"):
-    # ✅ API baru
-    return chromadb.PersistentClient(path=persist_dir)
+def embed_texts(texts: list[str]):
+    return embed_batch(texts)
 
-def embed_texts(model: SentenceTransformer, texts: list[str]):
-    return model.encode(texts, convert_to_numpy=True).tolist()
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
-def store_embeddings(doc_id: str, text: str, persist_dir="/data/chroma"):
-    client = get_client(persist_dir)
-    collection = client.get_or_create_collection("documents")
+def chunk_ids(doc_id: str, chunks: list[dict], seen: dict[str, int] = None) -> list[str]:
+    """
+    Id chunk = doc_id + hash konten. Chunk yang isinya sama antar versi dokumen
+    mendapat id yang sama, sehingga tidak perlu di-embed ulang. Teks duplikat
+    di dalam satu dokumen diberi suffix urutan. `seen` dibawa antar batch saat
+    chunk satu dokumen diproses secara streaming.
+    """
+    seen = {} if seen is None else seen
+    ids = []
+    for c in chunks:
+        h = content_hash(c["text"])
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        ids.append(f"{doc_id}_{h}" if n == 0 else f"{doc_id}_{h}_{n}")
+    return ids
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    chunks = chunk_text(text)
+def chunk_metadata(doc_id: str, chunk: dict) -> dict:
+    return {
+        "document_id": str(doc_id),
+        "chunk_index": chunk["index"],
+        "content_hash": content_hash(chunk["text"]),
+        "page": chunk["page"],
+        "page_end": chunk["page_end"],
+        "char_start": chunk["char_start"],
+        "char_end": chunk["char_end"],
+    }
 
-    embeddings = embed_texts(model, chunks)
-    ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
 
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=chunks,
-        metadatas=[{"document_id": str(doc_id), "chunk_index": i} for i in range(len(chunks))]
-    )
+class _CollectionSync:
+    """Diff incremental vector satu dokumen di satu collection, diisi per batch."""
 
-    return len(chunks)
+    def __init__(self, collection, doc_id: str, model: str = None):
+        self.collection = collection
+        self.doc_id = doc_id
+        self.model = model  # model embedding yang di-pin ke collection
+        current = collection.get(where={"document_id": doc_id}, include=["metadatas"])
+        self.existing = dict(zip(current["ids"], current["metadatas"]))
+        self.added = self.skipped = 0
 
-def delete_document_embeddings(doc_id: str):
-    client = get_client("/data/chroma")
-    collection = client.get_or_create_collection("documents")
+    def write(self, ids: list[str], chunks: list[dict], vectors: dict) -> None:
+        new = [(i, c) for i, c in zip(ids, chunks) if i not in self.existing]
+        if new:
+            self.collection.upsert(
+                ids=[i for i, _ in new],
+                embeddings=np.stack([vectors[i] for i, _ in new]),
+                documents=[c["text"] for _, c in new],
+                metadatas=[chunk_metadata(self.doc_id, c) for _, c in new],
+            )
 
-    # Ambil SEMUA vector tanpa include
-    data = collection.get()
-    
-    if not data or "ids" not in data:
-        return
+        # posisi (index/page/offset) chunk lama bisa bergeser; yang tidak berubah tidak ditulis ulang
+        moved = []
+        for i, c in zip(ids, chunks):
+            if i in self.existing:
+                meta = chunk_metadata(self.doc_id, c)
+                if self.existing[i] != meta:
+                    moved.append((i, meta))
+        if moved:
+            self.collection.update(
+                ids=[i for i, _ in moved],
+                metadatas=[meta for _, meta in moved],
+            )
+        self.added += len(new)
+        self.skipped += len(ids) - len(new)
+
+    def finish(self, seen: set[str]) -> int:
+        removed = [i for i in self.existing if i not in seen]
+        if removed:
+            self.collection.delete(ids=removed)
+        return len(removed)
+
+def _sync(
+    targets: list[_CollectionSync],
+    doc_id: str,
+    chunks: Iterable[dict],
+    embed_for: Callable[[str], Callable[[list[str]], np.ndarray]],
+    batch_size: int,
+    on_batch: Callable[[list[str], list[dict]], None] = None,
+    on_progress: Callable[[int], None] = None,
+) -> tuple[int, int, set[str]]:
+    """
+    Stream chunk per batch ke semua target: chunk yang belum ada di target
+    di-embed sekali per model (`embed_for(model)`; live dan shadow bisa beda
+    model saat reindex ganti model), lalu di-upsert. Chunk lama yang hilang dihapus di
+    akhir (setelah semua chunk baru tertulis).
+    Return (total chunk, removed di target pertama, id yang terlihat).
+    """
+    seen_counts: dict[str, int] = {}
+    seen: set[str] = set()
+    total = 0
+    for batch in iter_batches(chunks, batch_size):
+        ids = chunk_ids(doc_id, batch, seen_counts)
+        vectors: dict[str, dict] = {}
+        for model in dict.fromkeys(t.model for t in targets):
+            todo = {
+                i: c["text"]
+                for t in targets if t.model == model
+                for i, c in zip(ids, batch) if i not in t.existing
+            }
+            vectors[model] = dict(zip(todo, embed_for(model)(list(todo.values())))) if todo else {}
+        for t in targets:
+            t.write(ids, batch, vectors[t.model])
+        if on_batch:
+            on_batch(ids, batch)
+        seen.update(ids)
+        total += len(batch)
+        if on_progress:
+            on_progress(total)
+
+    if total == 0:
+        # stream kosong (mis. ekstraksi gagal): vector lama dibiarkan
+        return 0, 0, seen
+    removed = [t.finish(seen) for t in targets]
+    return total, removed[0], seen
+
+def sync_collection(
+    collection,
+    doc_id: str,
+    chunks: Iterable[dict],
+    embed_fn: Callable[[list[str]], np.ndarray],
+    batch_size: int,
+) -> dict:
+    """Sinkronkan vector satu dokumen di satu collection (tanpa index lexical)."""
+    target = _CollectionSync(collection, str(doc_id))
+    total, removed, _ = _sync([target], str(doc_id), chunks, lambda _: embed_fn, batch_size)
+    return {"total": total, "added": target.added, "skipped": target.skipped, "removed": removed}
+
+def _reindex():
+    # import lokal: modul reindex mengimpor modul ini
+    from domain.documents import reindex
+    return reindex
+
+def sync_document_chunks(
+    doc_id: str,
+    chunks: Iterable[dict],
+    on_progress: Callable[[int], None] = None,
+    batch_size: int = None,
+) -> dict:
+    """
+    Sinkronkan vector satu dokumen dengan chunk terbaru (incremental, streaming):
+    - chunk baru/berubah  -> di-embed lalu upsert, per batch
+    - chunk yang sama     -> dilewati (hanya metadata posisi diperbarui)
+    - chunk yang hilang   -> dihapus di akhir
+    `chunks` boleh berupa generator (mis. iter_chunks atas halaman yang
+    di-stream), sehingga memori sebanding ukuran batch, bukan dokumen.
+    Chunk juga ditulis ke index lexical (document_chunks). Selama reindex
+    berjalan, shadow collection ikut disinkronkan. Setiap collection di-embed
+    dengan model yang di-pin kepadanya.
+    """
+    batch_size = batch_size or get_settings().EMBEDDING_BATCH_SIZE
+    doc_id = str(doc_id)
+    store = get_vector_store()
 
-    all_ids = data["ids"]
+    def target(collection) -> _CollectionSync:
+        return _CollectionSync(collection, doc_id, store.model_of(collection.name))
 
-    # Filter vector yang sesuai prefix doc_id
-    target_ids = [eid for eid in all_ids if eid.startswith(f"{doc_id}-")]
+    live = target(get_collection(fresh=True))
+    targets = [live]
+    reindex = _reindex()
+    shadow = reindex.active_shadow()
+    if shadow:
+        targets.append(target(get_collection(shadow)))
 
-    if target_ids:
-        collection.delete(ids=target_ids)
+    def on_batch(ids: list[str], batch: list[dict]) -> None:
+        # index lexical ikut diperbarui (id sama dengan vector)
+        upsert_lexical_chunks(doc_id, ids, batch)
 
+    def embed_for(model: str) -> Callable[[list[str]], np.ndarray]:
+        return get_embedder(model).embed_batch
+
+    total, removed, seen = _sync(targets, doc_id, chunks, embed_for, batch_size, on_batch, on_progress)
+    if total:
+        prune_lexical_chunks(doc_id, seen)
+    if shadow:
+        reindex.mark_dirty([doc_id])
+
+    if live.added or removed:
+        bump_index_version()
+
+    return {
+        "total": total,
+        "added": live.added,
+        "skipped": live.skipped,
+        "removed": removed,
+    }
+
+def store_embeddings(doc_id: str, pages: Iterable[dict]) -> dict:
+    return sync_document_chunks(doc_id, iter_chunks(pages))
+
+def _delete_where(where: dict, doc_ids: list[str]) -> None:
+    get_collection(fresh=True).delete(where=where)
+    reindex = _reindex()
+    shadow = reindex.active_shadow()
+    if shadow:
+        get_collection(shadow).delete(where=where)
+        reindex.mark_dirty(doc_ids)
+    bump_index_version()
+
+def delete_document_embeddings(doc_id: str):
+    """
+    Hapus semua vector milik satu dokumen lewat filter metadata `document_id`.
+    Biaya sebanding dengan jumlah chunk dokumen itu, bukan ukuran corpus.
+    """
+    _delete_where({"document_id": str(doc_id)}, [str(doc_id)])
+
+def delete_documents_embeddings(doc_ids: list[str]):
+    """Bulk delete vector untuk banyak dokumen dalam satu panggilan."""
+    doc_ids = [str(d) for d in doc_ids]
+    if not doc_ids:
+        return
+    if len(doc_ids) == 1:
+        return delete_document_embeddings(doc_ids[0])
+    _delete_where({"document_id": {"$in": doc_ids}}, doc_ids)
@@ -2,6 +2,15 @@ import os
 import fitz  # PyMuPDF
 import docx
 import csv
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from multiprocessing import get_context
+from typing import Iterator
+from core.config import get_settings
+from core.logger import logger
 
 # List MIME yang dianggap valid
 PDF_MIMES = [
@@ -38,18 +47,112 @@ def clean_text(text: str) -> str:
 # PDF
 # ----------------------------
 
-def extract_pdf(path: str) -> str:
+def _iter_page_range(path: str, start: int, end: int) -> Iterator[dict]:
+    with fitz.open(path) as doc:
+        for i in range(start, end):
+            content = doc[i].get_text()
+            if content:
+                yield {"page": i + 1, "text": clean_text(content)}
+
+def _extract_page_range(path: str, start: int, end: int) -> list[dict]:
+    """Ekstrak halaman [start, end) — dijalankan di proses worker."""
+    return list(_iter_page_range(path, start, end))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def pdf_workers() -> int:
+    """
+    Ukuran pool ekstraksi per proses. Default (0) membagi CPU ke semua
+    proses ingest (INGEST_WORKERS), supaya N worker tidak masing-masing
+    memakai cpu_count proses.
+    """
+    settings = get_settings()
+    if settings.PDF_EXTRACT_WORKERS:
+        return settings.PDF_EXTRACT_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.INGEST_WORKERS))
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Satu process pool per proses (pdf_workers()), dibuat saat pertama
+    dipakai. Context "spawn": proses API/worker punya thread (threadpool,
+    heartbeat, client), fork dari proses multithread bisa mewarisi lock
+    yang sedang terkunci.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pdf_workers(), mp_context=get_context("spawn"))
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Buang pool yang rusak (mis. worker di-kill OOM); panggilan berikutnya membuat pool baru."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_pdf_pages(path: str, min_parallel_pages: int = None) -> Iterator[dict]:
+    """
+    Ekstrak PDF per halaman -> yield {"page": 1-based, "text": ...}, urut halaman.
+
+    PDF besar (>= min_parallel_pages) dibagi per range halaman ke process
+    pool bersama (_get_pool); di bawah threshold tetap single-process.
+    Hasil di-yield per range sehingga konsumen (chunker) bisa jalan sambil
+    ekstraksi berlangsung; range yang dikirim ke pool dibatasi (2 per
+    worker) agar halaman yang belum dikonsumsi tidak menumpuk. Jika pool
+    rusak (BrokenProcessPool), pool dibuang dan sisa halaman diekstrak
+    single-process.
+    """
+    if min_parallel_pages is None:
+        min_parallel_pages = get_settings().PDF_PARALLEL_MIN_PAGES
+    workers = pdf_workers()
+
     try:
-        text = []
         with fitz.open(path) as doc:
-            for page in doc:
-                content = page.get_text()
-                if content:
-                    text.append(content)
-        return clean_text("\n".join(text))
+            page_count = doc.page_count
+
+        if workers <= 1 or page_count < min_parallel_pages:
+            yield from _iter_page_range(path, 0, page_count)
+            return
+
+        # beberapa range per worker supaya beban tetap rata kalau halaman tidak seragam
+        n_ranges = min(page_count, workers * 4)
+        step = -(-page_count // n_ranges)
+        todo = iter([(s, min(s + step, page_count)) for s in range(0, page_count, step)])
+
+        pool = _get_pool()
+        futures: deque = deque()
+        done = 0  # halaman [0, done) sudah di-yield
+        try:
+            for s, e in islice(todo, workers * 2):
+                futures.append((e, pool.submit(_extract_page_range, path, s, e)))
+            # hasil diambil sesuai urutan range -> urutan halaman terjaga
+            while futures:
+                end, future = futures.popleft()
+                pages = future.result()
+                for s, e in islice(todo, 1):
+                    futures.append((e, pool.submit(_extract_page_range, path, s, e)))
+                yield from pages
+                done = end
+        except BrokenProcessPool as e:
+            logger.warning(f"PDF extract pool broken ({e}), continuing single-process from page {done + 1}")
+            _discard_pool(pool)
+            yield from _iter_page_range(path, done, page_count)
+        finally:
+            # konsumen berhenti / gagal: range yang belum jalan tidak dikerjakan
+            for _, future in futures:
+                future.cancel()
     except Exception as e:
         raise ValueError(f"Gagal ekstrak PDF: {e}")
 
+def extract_pdf_pages(path: str, min_parallel_pages: int = None) -> list[dict]:
+    return list(iter_pdf_pages(path, min_parallel_pages))
+
+def extract_pdf(path: str) -> str:
+    return clean_text("\n".join(p["text"] for p in extract_pdf_pages(path)))
+
 # ----------------------------
 # DOCX
 # ----------------------------
@@ -88,7 +191,7 @@ def extract_csv(path: str) -> str:
 # MASTER EXTRACTOR
 # ----------------------------
 
-def extract_text(path: str, mime: str = None) -> str:
+def _resolve_kind(path: str, mime: str = None) -> str:
     ext = os.path.splitext(path)[1].lower()
 
     # auto detect mime jika None
@@ -101,14 +204,45 @@ def extract_text(path: str, mime: str = None) -> str:
 
     # PDF
     if mime in PDF_MIMES or ext == ".pdf":
-        return extract_pdf(path)
+        return "pdf"
 
     # DOCX
     if mime in DOCX_MIMES or ext == ".docx":
-        return extract_docx(path)
+        return "docx"
 
     # CSV
     if mime in CSV_MIMES or ext == ".csv":
-        return extract_csv(path)
+        return "csv"
 
     raise ValueError(f"Tipe file tidak didukung: mime={mime}, ext={ext}")
+
+def extract_text(path: str, mime: str = None) -> str:
+    kind = _resolve_kind(path, mime)
+    if kind == "pdf":
+        return extract_pdf(path)
+    if kind == "docx":
+        return extract_docx(path)
+    return extract_csv(path)
+
+def iter_pages(path: str, mime: str = None) -> Iterator[dict]:
+    """
+    Seperti extract_text tetapi per halaman dan mempertahankan nomor halaman:
+    yield {"page": n, "text": ...}. DOCX/CSV tidak punya halaman -> satu page (1).
+    """
+    kind = _resolve_kind(path, mime)
+    if kind == "pdf":
+        yield from iter_pdf_pages(path)
+        return
+    text = extract_docx(path) if kind == "docx" else extract_csv(path)
+    if text:
+        yield {"page": 1, "text": text}
+
+def count_pages(path: str, mime: str = None) -> int:
+    """Jumlah halaman tanpa ekstraksi teks (untuk progress); DOCX/CSV = 1."""
+    if _resolve_kind(path, mime) != "pdf":
+        return 1
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+def extract_pages(path: str, mime: str = None) -> list[dict]:
+    return list(iter_pages(path, mime))
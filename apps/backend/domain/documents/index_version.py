@@ -0,0 +1,31 @@
+import threading
+
+from core.logger import logger
+from infra.db.redis import get_redis
+
+INDEX_VERSION_KEY = "index:version"
+
+# fallback kalau Redis tidak bisa dihubungi (hanya berlaku di proses ini)
+_local_version = 0
+_local_lock = threading.Lock()
+
+
+def get_index_version() -> int:
+    """Versi corpus/index saat ini. Berubah setiap upload, embed, atau delete."""
+    try:
+        value = get_redis().get(INDEX_VERSION_KEY)
+        return int(value) if value is not None else 0
+    except Exception as e:
+        logger.warning(f"Index version read failed, using local: {e}")
+        return _local_version
+
+
+def bump_index_version() -> int:
+    global _local_version
+    with _local_lock:
+        _local_version += 1
+    try:
+        return int(get_redis().incr(INDEX_VERSION_KEY))
+    except Exception as e:
+        logger.warning(f"Index version bump failed, using local: {e}")
+        return _local_version
@@ -0,0 +1,161 @@
+import json
+import time
+import uuid
+from itertools import chain
+
+from core.config import get_settings
+from core.logger import logger
+from domain.documents.chunker import iter_chunks
+from domain.documents.embedder import sync_document_chunks
+from domain.documents.extractor import count_pages, iter_pages
+from domain.documents.models import Document
+from domain.documents.text_store import iter_save_pages
+from infra.db.postgres import SessionLocal
+from infra.db.redis import get_redis
+
+# urutan stage, juga dipakai sebagai nilai Document.status.
+# Ekstraksi, chunking dan embedding berjalan streaming (halaman -> chunk ->
+# batch embedding): "chunking" dimulai saat chunk pertama jadi, "embedding"
+# begitu batch pertama di-embed.
+STAGES = ["uploaded", "extracting", "chunking", "embedding", "indexed"]
+MIN_TEXT_CHARS = 5
+FAILED = "failed"
+
+
+def _job_key(job_id: str) -> str:
+    return f"ingest:job:{job_id}"
+
+
+def _update_job(job_id: str, **fields) -> None:
+    settings = get_settings()
+    redis = get_redis()
+    fields["updated_at"] = time.time()
+    key = _job_key(job_id)
+    redis.hset(key, mapping={k: json.dumps(v) for k, v in fields.items()})
+    redis.expire(key, settings.INGEST_JOB_TTL)
+
+
+def enqueue_ingestion(doc_id: str, path: str, filetype: str) -> str:
+    """Daftarkan job ingestion ke queue Redis, return job_id."""
+    settings = get_settings()
+    job_id = uuid.uuid4().hex
+    _update_job(
+        job_id,
+        job_id=job_id,
+        doc_id=str(doc_id),
+        stage="uploaded",
+        progress=0.0,
+        error=None,
+        created_at=time.time(),
+    )
+    get_redis().lpush(settings.INGEST_QUEUE, json.dumps({
+        "job_id": job_id,
+        "doc_id": str(doc_id),
+        "path": path,
+        "filetype": filetype,
+    }))
+    return job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    raw = get_redis().hgetall(_job_key(job_id))
+    if not raw:
+        return None
+    return {k.decode(): json.loads(v) for k, v in raw.items()}
+
+
+def _set_stage(db, doc: Document, job_id: str, stage: str, **fields) -> None:
+    doc.status = stage
+    db.commit()
+    _update_job(job_id, stage=stage, **fields)
+    logger.info(f"[ingest {job_id}] doc={doc.id} stage={stage}")
+
+
+def _set_status(doc_id, stage: str) -> None:
+    # session terpisah: session utama masih menahan halaman yang belum di-commit
+    with SessionLocal() as db:
+        db.query(Document).filter(Document.id == doc_id).update({"status": stage}, synchronize_session=False)
+        db.commit()
+
+
+def run_ingestion(job: dict) -> None:
+    """
+    Pipeline ingestion satu dokumen:
+    uploaded -> extracting -> chunking -> embedding -> indexed
+    Halaman di-stream dari extractor ke tabel halaman, chunker, lalu embedding
+    per batch, sehingga memori tidak sebanding ukuran dokumen. Dokumen tanpa
+    teks gagal sebelum menyentuh vector store. Progress disimpan di
+    Document.status dan di hash job Redis.
+    """
+    job_id = job["job_id"]
+    started = time.time()
+
+    with SessionLocal() as db:
+        doc = db.query(Document).filter(Document.id == job["doc_id"]).first()
+        if not doc:
+            _update_job(job_id, stage=FAILED, error="Document not found")
+            return
+
+        try:
+            page_count = count_pages(job["path"], job["filetype"])
+            _set_stage(db, doc, job_id, "extracting", progress=0.0, pages=page_count)
+
+            seen = {"page": 0, "chars": 0, "chunking": False, "embedding": False}
+
+            def tracked(pages):
+                for p in pages:
+                    seen["page"] = p["page"]
+                    seen["chars"] += len(p["text"].strip())
+                    yield p
+
+            def announced(chunks):
+                for c in chunks:
+                    if not seen["chunking"]:
+                        seen["chunking"] = True
+                        _set_status(doc.id, "chunking")
+                        _update_job(job_id, stage="chunking")
+                    yield c
+
+            def on_progress(done: int) -> None:
+                fields = {"progress": round(min(seen["page"] / max(page_count, 1), 1.0), 4), "chunks_done": done}
+                if not seen["embedding"]:
+                    seen["embedding"] = True
+                    _set_status(doc.id, "embedding")
+                    fields["stage"] = "embedding"
+                _update_job(job_id, **fields)
+
+            # EXTRACT -> SIMPAN HALAMAN -> CHUNK -> EMBED + INDEX
+            # (incremental: hanya chunk baru yang di-embed)
+            pages = tracked(iter_save_pages(db, doc, iter_pages(job["path"], job["filetype"])))
+            # baca halaman sampai ada teks: dokumen kosong gagal sebelum sync
+            # (chunk lama di vector store tidak ikut terhapus)
+            head = []
+            for p in pages:
+                head.append(p)
+                if seen["chars"] >= MIN_TEXT_CHARS:
+                    break
+            if seen["chars"] < MIN_TEXT_CHARS:
+                raise ValueError("Failed to extract text")
+
+            result = sync_document_chunks(
+                str(doc.id),
+                announced(iter_chunks(chain(head, pages))),
+                on_progress=on_progress,
+            )
+
+            _set_stage(
+                db, doc, job_id, "indexed",
+                progress=1.0,
+                chunks_created=result["total"],
+                chunks_added=result["added"],
+                chunks_skipped=result["skipped"],
+                chunks_removed=result["removed"],
+                duration_s=round(time.time() - started, 3),
+            )
+
+        except Exception as e:
+            logger.error(f"[ingest {job_id}] failed: {e}")
+            db.rollback()
+            doc.status = FAILED
+            db.commit()
+            _update_job(job_id, stage=FAILED, error=str(e))
@@ -0,0 +1,82 @@
+from sqlalchemy import Text, cast, func
+from sqlalchemy.dialects.postgresql import insert
+
+from domain.documents.models import DocumentChunk
+from infra.db.postgres import SessionLocal
+
+
+def upsert_lexical_chunks(doc_id: str, ids: list[str], chunks: list[dict]) -> None:
+    """Tulis satu batch chunk lexical (id = id vector); chunk yang sudah ada diperbarui posisinya."""
+    if not ids:
+        return
+    stmt = insert(DocumentChunk).values([
+        {
+            "id": cid,
+            "document_id": doc_id,
+            "chunk_index": c["index"],
+            "page": c["page"],
+            "char_start": c["char_start"],
+            "char_end": c["char_end"],
+            "content": c["text"],
+        }
+        for cid, c in zip(ids, chunks)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DocumentChunk.id],
+        set_={col: stmt.excluded[col] for col in ("chunk_index", "page", "char_start", "char_end")},
+    )
+    with SessionLocal() as db:
+        db.execute(stmt)
+        db.commit()
+
+
+def prune_lexical_chunks(doc_id: str, keep: set[str]) -> None:
+    """Hapus chunk lexical dokumen yang tidak ada lagi di versi terbaru."""
+    with SessionLocal() as db:
+        existing = db.query(DocumentChunk.id).filter(DocumentChunk.document_id == doc_id).all()
+        stale = [row.id for row in existing if row.id not in keep]
+        if stale:
+            db.query(DocumentChunk).filter(DocumentChunk.id.in_(stale)).delete(synchronize_session=False)
+            db.commit()
+
+
+def _or_tsquery(q: str):
+    # plainto_tsquery menggabungkan term dengan AND; diubah ke OR supaya
+    # chunk yang memuat sebagian term (mis. hanya kode error-nya) tetap masuk
+    return func.to_tsquery("simple", func.replace(cast(func.plainto_tsquery("simple", q), Text), "&", "|"))
+
+
+def lexical_search(q: str, limit: int) -> list[dict]:
+    """Full-text search di document_chunks, urut ts_rank_cd."""
+    query = _or_tsquery(q)
+    score = func.ts_rank_cd(DocumentChunk.tsv, query)
+    with SessionLocal() as db:
+        rows = (
+            db.query(
+                DocumentChunk.id,
+                DocumentChunk.document_id,
+                DocumentChunk.chunk_index,
+                DocumentChunk.page,
+                DocumentChunk.char_start,
+                DocumentChunk.char_end,
+                DocumentChunk.content,
+            )
+            .filter(DocumentChunk.tsv.op("@@")(query))
+            .order_by(score.desc())
+            .limit(limit)
+            .all()
+        )
+    return [
+        {
+            "id": row.id,
+            "text": row.content,
+            "metadata": {
+                "document_id": str(row.document_id),
+                "chunk_index": row.chunk_index,
+                "page": row.page,
+                "char_start": row.char_start,
+                "char_end": row.char_end,
+            },
+        }
+        for row in rows
+    ]
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, func, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, func, Integer, LargeBinary, ForeignKey, Text, Computed, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 import uuid
 from infra.db.base import Base
 
@@ -10,5 +10,39 @@ class Document(Base):
     filename = Column(String, nullable=False)
     filetype = Column(String, nullable=False)
     status = Column(String, default="uploaded")
-    extracted_text = Column(Text, nullable=True)   # ⬅️ teks hasil ekstraksi
+    # teks hasil ekstraksi ada di document_pages; di sini hanya ringkasannya
+    page_count = Column(Integer, nullable=True)
+    text_chars = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class DocumentPage(Base):
+    """Teks hasil ekstraksi per halaman, dikompresi zstd (lihat text_store)."""
+    __tablename__ = "document_pages"
+
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    page = Column(Integer, primary_key=True)
+    char_count = Column(Integer, nullable=False)
+    content = Column(LargeBinary, nullable=False)
+
+class DocumentChunk(Base):
+    """
+    Salinan chunk untuk pencarian lexical (full-text Postgres). Id sama dengan
+    id vector di Chroma sehingga hasil kedua retriever bisa digabung.
+    Config 'simple' (tanpa stemming) supaya kode error, SKU, dan nama diri
+    tetap cocok persis.
+    """
+    __tablename__ = "document_chunks"
+
+    id = Column(String, primary_key=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    page = Column(Integer, nullable=True)
+    char_start = Column(Integer, nullable=True)
+    char_end = Column(Integer, nullable=True)
+    content = Column(Text, nullable=False)
+    tsv = Column(TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True))
+
+    __table_args__ = (
+        Index("ix_document_chunks_tsv", "tsv", postgresql_using="gin"),
+        Index("ix_document_chunks_document_id", "document_id"),
+    )
@@ -0,0 +1,355 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from core.config import get_settings
+from core.logger import logger
+from domain.documents.chunker import iter_chunks
+from domain.documents.embedder import chunk_ids, chunk_metadata, iter_batches, sync_collection
+from domain.documents.index_version import bump_index_version
+from domain.documents.lexical import prune_lexical_chunks, upsert_lexical_chunks
+from domain.documents.models import Document
+from domain.documents.text_store import FLUSH_PAGES, load_pages
+from infra.db.postgres import SessionLocal
+from infra.db.redis import get_redis
+from infra.db.vector_store import DEFAULT_COLLECTION, get_vector_store
+from infra.llm.embedder import get_embedder
+
+STATE_KEY = "reindex:state"
+LOCK_KEY = "reindex:lock"
+LOCK_TTL = 60  # detik; heartbeat memperpanjang lock selama run masih hidup
+DIRTY_KEY = "reindex:dirty"  # dokumen yang berubah/terhapus selama run
+
+
+def get_state() -> dict | None:
+    raw = get_redis().hgetall(STATE_KEY)
+    if not raw:
+        return None
+    return {k.decode(): json.loads(v) for k, v in raw.items()}
+
+
+def _save_state(**fields) -> None:
+    get_redis().hset(STATE_KEY, mapping={k: json.dumps(v) for k, v in fields.items()})
+
+
+def _shadow_name(run_id: str) -> str:
+    return f"{DEFAULT_COLLECTION}__reindex_{run_id}"
+
+
+def acquire_lock(run_id: str) -> bool:
+    # lock run yang crash baru bisa diambil alih setelah heartbeat-nya habis
+    return bool(get_redis().set(LOCK_KEY, run_id, nx=True, ex=LOCK_TTL))
+
+
+def release_lock(run_id: str) -> None:
+    redis = get_redis()
+    current = redis.get(LOCK_KEY)
+    if current is not None and current.decode() == run_id:
+        redis.delete(LOCK_KEY)
+
+
+class LockLost(RuntimeError):
+    pass
+
+
+def _heartbeat(run_id: str, stop: threading.Event, lost: threading.Event) -> None:
+    """
+    Perpanjang lock selama run hidup. Jika lock diambil run lain, atau tidak
+    bisa diperpanjang sampai TTL-nya habis, `lost` di-set dan run berhenti
+    menulis (lihat _ensure_lock).
+    """
+    redis = get_redis()
+    renewed = time.monotonic()
+    while not stop.wait(LOCK_TTL / 3):
+        try:
+            current = redis.get(LOCK_KEY)
+            if current is None or current.decode() != run_id:
+                logger.error(f"Reindex {run_id} lost its lock")
+                lost.set()
+                return
+            redis.expire(LOCK_KEY, LOCK_TTL)
+            renewed = time.monotonic()
+        except Exception as e:
+            logger.error(f"Reindex {run_id} heartbeat failed: {e}")
+            if time.monotonic() - renewed >= LOCK_TTL:
+                lost.set()
+                return
+
+
+def _ensure_lock(run_id: str, lost: threading.Event) -> None:
+    if lost.is_set():
+        raise LockLost(f"Reindex {run_id} lost its lock, aborting")
+
+
+def active_shadow() -> str | None:
+    """Shadow collection run yang sedang aktif (pegang lock), untuk mirror write."""
+    try:
+        run_id = get_redis().get(LOCK_KEY)
+    except Exception as e:
+        logger.warning(f"Reindex lock lookup failed: {e}")
+        return None
+    return _shadow_name(run_id.decode()) if run_id else None
+
+
+def mark_dirty(doc_ids: list[str]) -> None:
+    """Catat dokumen yang diubah/dihapus selama run; disinkronkan ulang sebelum swap."""
+    if doc_ids:
+        get_redis().sadd(DIRTY_KEY, *doc_ids)
+
+
+def start_run(resume: bool = False) -> dict | None:
+    """
+    Siapkan state run baru, atau lanjutkan run yang belum selesai (resume).
+    Lock diambil di sini; return None jika run lain masih memegang lock.
+    Eksekusi dilakukan oleh run_reindex().
+    """
+    state = get_state()
+    if resume and state and state.get("status") in ("pending", "running", "failed"):
+        return state if acquire_lock(state["run_id"]) else None
+
+    settings = get_settings()
+    model = settings.REINDEX_EMBEDDING_MODEL or settings.EMBEDDING_MODEL
+    run_id = uuid.uuid4().hex[:12]
+    store = get_vector_store()
+    # pin sebelum lock: mirror write melihat shadow begitu lock ada
+    store.pin_model(_shadow_name(run_id), model)
+    if not acquire_lock(run_id):
+        store.drop_collection(_shadow_name(run_id))
+        return None
+
+    if state and state.get("status") != "done" and state.get("shadow"):
+        # run lama yang gagal/terhenti dan tidak di-resume: shadow-nya dibuang
+        try:
+            store.drop_collection(state["shadow"])
+        except Exception as e:
+            logger.warning(f"Dropping abandoned reindex shadow {state['shadow']} failed: {e}")
+
+    state = {
+        "run_id": run_id,
+        "shadow": _shadow_name(run_id),
+        "status": "pending",
+        "model": model,
+        "last_doc_id": None,
+        "docs_done": 0,
+        "chunks_done": 0,
+        "encode_seconds": 0.0,
+        "started_at": time.time(),
+        "error": None,
+    }
+    get_redis().delete(STATE_KEY, DIRTY_KEY)
+    _save_state(**state)
+    return state
+
+
+def _iter_doc_pages(doc_id, window: int = FLUSH_PAGES):
+    """
+    Halaman satu dokumen per jendela `window` halaman (keyset by nomor
+    halaman), masing-masing dengan session pendek -> dokumen besar tidak
+    pernah dimuat utuh.
+    """
+    first = None
+    while True:
+        with SessionLocal() as db:
+            pages = load_pages(db, doc_id, first=first, limit=window)
+        yield from pages
+        if len(pages) < window:
+            return
+        first = pages[-1]["page"] + 1
+
+
+def _iter_documents(after_id: str | None, page_size: int, created_since: datetime | None = None):
+    """Stream (doc_id, iterator halaman) dari Postgres (keyset pagination by id)."""
+    last = after_id
+    while True:
+        with SessionLocal() as db:
+            q = db.query(Document.id).filter(Document.text_chars > 0)
+            if last is not None:
+                q = q.filter(Document.id > last)
+            if created_since is not None:
+                q = q.filter(Document.created_at >= created_since)
+            ids = [row.id for row in q.order_by(Document.id).limit(page_size).all()]
+        if not ids:
+            return
+        for doc_id in ids:
+            # teks dimuat lazy per jendela halaman saat chunk dikonsumsi
+            yield doc_id, _iter_doc_pages(doc_id)
+        last = ids[-1]
+
+
+def _sync_dirty(shadow, embed_fn, batch_size: int, ensure_lock) -> int:
+    """
+    Samakan shadow dengan Postgres untuk dokumen di DIRTY_KEY (sampai set
+    kosong; dokumen yang berubah lagi selama proses ini ditambahkan ulang).
+    """
+    redis = get_redis()
+    count = 0
+    while (doc_id := redis.spop(DIRTY_KEY)) is not None:
+        doc_id = doc_id.decode()
+        ensure_lock()
+        # dokumen terhapus / tanpa halaman -> stream kosong -> hapus dari shadow
+        result = sync_collection(shadow, doc_id, iter_chunks(_iter_doc_pages(doc_id)), embed_fn, batch_size)
+        if not result["total"]:
+            shadow.delete(where={"document_id": doc_id})
+        count += 1
+    return count
+
+
+def run_reindex(run_id: str) -> None:
+    """
+    Bangun ulang seluruh index ke shadow collection:
+    - dokumen di-stream dari Postgres per halaman
+    - chunk dari banyak dokumen di-encode dalam batch berukuran tetap
+    - checkpoint (dokumen terakhir yang seluruh chunk-nya sudah tertulis)
+      disimpan ke Redis setelah setiap batch, sehingga bisa di-resume
+    - selama run, upload/re-embed/delete ikut ditulis ke shadow dan dicatat
+      di DIRTY_KEY; dokumen itu disinkronkan ulang dari Postgres sebelum swap
+    - shadow di-embed dengan model run (state["model"]) lewat embedder
+      sendiri; query/ingestion live tetap memakai model collection live
+      sampai swap mengganti pointer (model ikut pointer)
+    - jika lock hilang (heartbeat gagal / diambil run lain) run berhenti
+      sebelum menulis lagi
+    - di akhir, shadow di-swap menjadi collection live
+    """
+    settings = get_settings()
+    state = get_state()
+    if not state or state["run_id"] != run_id:
+        raise ValueError(f"Reindex run {run_id} tidak ditemukan")
+    current = get_redis().get(LOCK_KEY)
+    if current is None or current.decode() != run_id:
+        # lock diambil start_run(); tanpa lock berarti run lain yang aktif
+        raise RuntimeError("Reindex lain sedang berjalan")
+
+    store = get_vector_store()
+    shadow = store.collection(state["shadow"])
+    batch_size = settings.REINDEX_BATCH_SIZE
+    # embedder model run, terpisah dari embedder live
+    embed_fn = get_embedder(state["model"]).embed_batch
+    stop, lost = threading.Event(), threading.Event()
+
+    def ensure_lock() -> None:
+        _ensure_lock(run_id, lost)
+
+    docs_done = state["docs_done"]
+    chunks_done = state["chunks_done"]
+    encode_seconds = state["encode_seconds"]
+    last_doc_id = state["last_doc_id"]
+    run_started = time.time()
+
+    # buffer chunk lintas dokumen + batas akhir tiap dokumen di stream chunk
+    buffer: list[tuple[str, str, dict]] = []
+    doc_ends: deque = deque()
+    queued = flushed = 0
+
+    def throughput() -> float:
+        # hanya chunk dari proses ini (run yang di-resume tidak ikut dihitung)
+        elapsed = time.time() - run_started
+        return round(flushed / elapsed, 2) if elapsed else 0.0
+
+    def flush(n: int) -> None:
+        nonlocal flushed, chunks_done, encode_seconds, docs_done, last_doc_id
+        batch = buffer[:n]
+        del buffer[:n]
+
+        if batch:
+            t0 = time.perf_counter()
+            ensure_lock()
+            embeddings = embed_fn([c["text"] for _, _, c in batch])
+            encode_seconds += time.perf_counter() - t0
+
+            shadow.upsert(
+                ids=[cid for _, cid, _ in batch],
+                embeddings=embeddings,
+                documents=[c["text"] for _, _, c in batch],
+                metadatas=[chunk_metadata(doc_id, c) for doc_id, _, c in batch],
+            )
+            flushed += len(batch)
+            chunks_done += len(batch)
+
+        # dokumen yang seluruh chunk-nya sudah tertulis -> boleh di-checkpoint
+        while doc_ends and doc_ends[0][1] <= flushed:
+            last_doc_id = doc_ends.popleft()[0]
+            docs_done += 1
+
+        _save_state(
+            status="running",
+            last_doc_id=last_doc_id,
+            docs_done=docs_done,
+            chunks_done=chunks_done,
+            encode_seconds=round(encode_seconds, 3),
+            chunks_per_sec=throughput(),
+        )
+
+    def lexical(doc_id: str, fn, *args) -> bool:
+        try:
+            fn(doc_id, *args)
+            return True
+        except Exception as e:
+            # mis. dokumen terhapus selama reindex berjalan
+            logger.warning(f"Reindex {run_id}: lexical sync failed for {doc_id}: {e}")
+            return False
+
+    def process(docs) -> None:
+        nonlocal queued
+        for doc_id, pages in docs:
+            doc_id = str(doc_id)
+            counts: dict[str, int] = {}
+            seen: set[str] = set()
+            lexical_ok = True
+            # chunk di-stream per batch; dokumen besar tidak ditampung utuh
+            for chunks in iter_batches(iter_chunks(pages), batch_size):
+                ids = chunk_ids(doc_id, chunks, counts)
+                lexical_ok = lexical_ok and lexical(doc_id, upsert_lexical_chunks, ids, chunks)
+                seen.update(ids)
+                buffer.extend((doc_id, cid, chunk) for cid, chunk in zip(ids, chunks))
+                queued += len(chunks)
+
+                while len(buffer) >= batch_size:
+                    flush(batch_size)
+            if lexical_ok:
+                lexical(doc_id, prune_lexical_chunks, seen)
+            doc_ends.append((doc_id, queued))
+        # sisa buffer + dokumen tanpa chunk di ekor stream
+        if buffer or doc_ends:
+            flush(len(buffer))
+
+    threading.Thread(target=_heartbeat, args=(run_id, stop, lost), daemon=True).start()
+    try:
+        _save_state(status="running")
+        logger.info(f"Reindex {run_id} started (resume from {last_doc_id})")
+        process(_iter_documents(last_doc_id, settings.REINDEX_PAGE_SIZE))
+
+        # catch-up: dokumen yang masuk selama reindex berjalan
+        started_at = datetime.fromtimestamp(state["started_at"], tz=timezone.utc)
+        process(_iter_documents(None, settings.REINDEX_PAGE_SIZE, created_since=started_at))
+
+        # dokumen yang diubah/dihapus selama run: tulisan stream di atas bisa basi
+        resynced = _sync_dirty(shadow, embed_fn, batch_size, ensure_lock)
+        logger.info(f"Reindex {run_id}: resynced {resynced} changed documents")
+
+        ensure_lock()
+        current = get_redis().get(LOCK_KEY)
+        if current is None or current.decode() != run_id:
+            raise LockLost(f"Reindex {run_id} lost its lock before swap")
+        store.swap_collection(state["shadow"], DEFAULT_COLLECTION)
+        bump_index_version()
+
+        _save_state(
+            status="done",
+            finished_at=time.time(),
+            chunks_per_sec=throughput(),
+        )
+        logger.info(f"Reindex {run_id} done: {docs_done} docs, {chunks_done} chunks")
+    except LockLost as e:
+        # state sekarang milik run lain -> tidak ditimpa
+        logger.error(str(e))
+        raise
+    except Exception as e:
+        logger.error(f"Reindex {run_id} failed: {e}")
+        _save_state(status="failed", error=str(e))
+        raise
+    finally:
+        stop.set()
+        release_lock(run_id)
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextvars import copy_context
+from functools import lru_cache
+
+import numpy as np
+
+from core.config import get_settings
+from core.logger import logger
+from core.metrics import stage
+from domain.documents.lexical import lexical_search
+from infra.db.vector_store import get_collection, get_vector_store
+from infra.llm.embedder import get_embedder
+from infra.llm.reranker import get_reranker
+
+
+@lru_cache
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=get_settings().LEXICAL_SEARCH_WORKERS,
+        thread_name_prefix="lexical",
+    )
+
+
+def _timed_lexical_search(q: str, limit: int) -> list[dict]:
+    with stage("lexical"):
+        return lexical_search(q, limit)
+
+
+def embedder_for(collection):
+    """Embedder model yang di-pin ke `collection` (query harus satu ruang vector dengannya)."""
+    return get_embedder(get_vector_store().model_of(collection.name))
+
+
+def vector_search_batch(query_embs: np.ndarray, limit: int, collection=None) -> list[list[dict]]:
+    """Satu query ke vector store untuk banyak embedding; hasil per query."""
+    if collection is None:
+        collection = get_collection()
+    results = collection.query(
+        query_embeddings=query_embs,
+        n_results=limit,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [{"id": i, "text": d, "metadata": m or {}} for i, d, m in zip(ids, docs, metas)]
+        for ids, docs, metas in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+
+
+def vector_search(query_emb: np.ndarray, limit: int) -> list[dict]:
+    return vector_search_batch(np.asarray(query_emb)[None, :], limit)[0]
+
+
+def rrf_merge(rankings: list[list[dict]], top_k: int, k: int = 60) -> list[dict]:
+    """
+    Reciprocal rank fusion: skor = sum(1 / (k + rank)) dari setiap ranking.
+    Tidak butuh normalisasi skor antar retriever (cosine vs ts_rank).
+    """
+    merged: dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = merged.setdefault(hit["id"], {**hit, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(merged.values(), key=lambda h: h["score"], reverse=True)[:top_k]
+
+
+def hybrid_search_batch(
+    queries: list[str],
+    top_k: int,
+    query_embs: np.ndarray = None,
+    collection=None,
+) -> list[list[dict]]:
+    """
+    Ambil chunk paling relevan untuk banyak query sekaligus: full-text
+    Postgres (per query, di thread pool) jalan bersamaan dengan embed
+    (satu panggilan encode) + vector search (satu query ke Chroma), lalu
+    tiap query digabung dengan RRF (lexical yang melewati LEXICAL_TIMEOUT_MS
+    dilewati; query itu memakai hasil vector saja). Jika RERANK_ENABLED,
+    kandidat yang lebih lebar diurutkan ulang dengan cross-encoder (satu
+    predict untuk semua query). `query_embs` yang diberikan caller harus
+    berasal dari embedder_for(`collection`).
+    Return per query: list {"id", "text", "metadata", "score"[, "rerank_score"]}.
+    """
+    settings = get_settings()
+    pool = max(top_k, settings.RERANK_CANDIDATES) if settings.RERANK_ENABLED else top_k
+    hybrid = settings.HYBRID_SEARCH_ENABLED
+    depth = max(pool, settings.HYBRID_CANDIDATES) if hybrid else pool
+
+    # context disalin supaya timing stage lexical ikut tercatat di request ini;
+    # satu deadline untuk semua query di batch
+    lexical_deadline = time.monotonic() + settings.LEXICAL_TIMEOUT_MS / 1000
+    lexical = [
+        _executor().submit(copy_context().run, _timed_lexical_search, q, depth)
+        for q in queries
+    ] if hybrid else []
+
+    if collection is None:
+        collection = get_collection()
+    if query_embs is None:
+        with stage("embed"):
+            query_embs = embedder_for(collection).embed_queries(queries)
+    with stage("vector"):
+        dense = vector_search_batch(query_embs, depth, collection)
+
+    results = []
+    for i in range(len(queries)):
+        hits = dense[i]
+        if hybrid:
+            try:
+                sparse = lexical[i].result(timeout=max(0.0, lexical_deadline - time.monotonic()))
+            except FutureTimeout:
+                # Postgres lambat/antrean penuh: jangan tahan request, degradasi ke vector saja
+                lexical[i].cancel()
+                logger.warning(
+                    f"Lexical search over {settings.LEXICAL_TIMEOUT_MS} ms, using vector results only"
+                )
+                sparse = []
+            except Exception as e:
+                # index lexical opsional: gagal -> tetap pakai hasil vector
+                logger.warning(f"Lexical search failed, using vector results only: {e}")
+                sparse = []
+            hits = rrf_merge([hits, sparse], pool, settings.RRF_K)
+        results.append(hits)
+
+    if settings.RERANK_ENABLED:
+        # semua (query, chunk) dalam satu predict, satu deadline untuk seluruh batch
+        with stage("rerank"):
+            results = get_reranker().rerank_batch(queries, results, top_k)
+    return results
+
+
+def hybrid_search(q: str, top_k: int, query_emb: np.ndarray = None, collection=None) -> list[dict]:
+    embs = None if query_emb is None else np.asarray(query_emb)[None, :]
+    return hybrid_search_batch([q], top_k, embs, collection)[0]
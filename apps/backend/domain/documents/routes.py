@@ -1,104 +1,161 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Response
+from sqlalchemy import func
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from infra.db.postgres import get_db
+from infra.db.pagination import keyset_page, get_pivot
 from domain.documents import models, schemas
 from core.config import get_settings
 from datetime import datetime
 import os
 import shutil
 import uuid
-from domain.documents.extractor import extract_text
-from domain.documents.embedder import store_embeddings, get_client
-from sentence_transformers import SentenceTransformer
-from domain.documents.llm_client import generate_answer
-from domain.documents.embedder import delete_document_embeddings, chunk_text
+from domain.documents.extractor import iter_pages
+from domain.documents.text_store import save_pages, iter_stored_pages
+from domain.documents.embedder import store_embeddings
+from infra.db.vector_store import get_collection
+from domain.documents.retrieval import embedder_for, hybrid_search, hybrid_search_batch
+from domain.documents.llm_client import generate_answer, stream_answer
+from domain.chat.prompt_template import build_ask_prompt
+from core.logger import logger
+from core.sse import sse_event, SSE_HEADERS
+from core.metrics import stage
+from domain.documents.embedder import delete_document_embeddings, delete_documents_embeddings
 from domain.documents.models import Document
+from domain.documents.answer_cache import get_answer_cache
+from domain.documents.index_version import get_index_version, bump_index_version
+from domain.documents.ingestion import enqueue_ingestion, get_job
+from domain.documents import reindex
 
 router = APIRouter(prefix="/docs", tags=["documents"])
 
 UPLOAD_DIR = "/data/uploads"
-CHROMA_DIR = "/data/chroma"
 CACHE_DIR = "/data/cache"  # if exists (opsional)
 
+def _upload_path(doc: Document) -> str:
+    return os.path.join(get_settings().UPLOAD_DIR, f"{doc.id}{os.path.splitext(doc.filename)[1]}")
+
+def _remove_upload(doc: Document) -> None:
+    # file disimpan sebagai {doc_id}{ext}; nama asli untuk upload lama
+    for path in (_upload_path(doc), os.path.join(UPLOAD_DIR, doc.filename)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _count_files(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with os.scandir(path) as it:
+        return sum(1 for e in it if e.is_file())
+
 @router.get("/inspect")
-def inspect_documents(db: Session = Depends(get_db)):
-    # 1. Uploaded files
-    uploads = []
-    if os.path.exists(UPLOAD_DIR):
-        uploads = os.listdir(UPLOAD_DIR)
-
-    # 2. Metadata from DB
-    docs = db.query(Document).all()
+def inspect_documents(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    before: str | None = Query(None, description="Cursor: id dokumen terakhir di halaman sebelumnya"),
+    db: Session = Depends(get_db),
+):
+    """
+    Ringkasan ringan: agregat dihitung di SQL, teks hasil ekstraksi tidak
+    pernah dimuat (hanya text_chars), daftar dokumen dipaginasi, dan jumlah
+    chunk per dokumen diambil dari metadata vector.
+    """
+    # 1. Agregat per status
+    by_status = dict(
+        db.query(Document.status, func.count(Document.id))
+        .group_by(Document.status)
+        .all()
+    )
+    with_text = (
+        db.query(func.count(Document.id))
+        .filter(Document.text_chars > 0)
+        .scalar()
+    )
+
+    # 2. Metadata dokumen (paginasi keyset)
+    sort_cols = [Document.created_at, Document.id]
+    pivot = get_pivot(db, Document, sort_cols, before)
+    docs = keyset_page(
+        db.query(
+            Document.id,
+            Document.filename,
+            Document.filetype,
+            Document.status,
+            Document.created_at,
+            Document.page_count,
+            (func.coalesce(Document.text_chars, 0) > 0).label("has_extracted_text"),
+        ),
+        sort_cols,
+        pivot,
+        limit,
+        before=True,
+        newest_first=True,
+    )
+    if len(docs) == limit:
+        response.headers["X-Next-Before"] = str(docs[-1].id)
+
+    # 3. Jumlah chunk per dokumen (hanya dokumen di halaman ini)
+    chunk_counts: dict[str, int] = {}
+    doc_ids = [str(d.id) for d in docs]
+    if doc_ids:
+        try:
+            where = {"document_id": doc_ids[0]} if len(doc_ids) == 1 else {"document_id": {"$in": doc_ids}}
+            metas = get_collection().get(where=where, include=["metadatas"])["metadatas"]
+            for meta in metas:
+                chunk_counts[meta["document_id"]] = chunk_counts.get(meta["document_id"], 0) + 1
+        except Exception as e:
+            logger.warning(f"Inspect chunk count failed: {e}")
+
     metadata = [
         {
             "id": str(doc.id),
             "filename": doc.filename,
             "filetype": doc.filetype,
             "status": doc.status,
-            "has_extracted_text": doc.extracted_text is not None and len(doc.extracted_text) > 0,
+            "has_extracted_text": bool(doc.has_extracted_text),
+            "pages": doc.page_count,
+            "chunks": chunk_counts.get(str(doc.id), 0),
             "created_at": doc.created_at
         }
         for doc in docs
     ]
 
-    # 3. Embeddings (list ids stored in Chroma)
     try:
-        client = get_client(CHROMA_DIR)
-        collection = client.get_or_create_collection("documents")
-        embeddings_ids = collection.get()["ids"]
+        total_chunks = get_collection().count()
     except Exception:
-        embeddings_ids = []
-
-    # 4. Cache folder (opsional)
-    cache_files = []
-    if os.path.exists(CACHE_DIR):
-        cache_files = os.listdir(CACHE_DIR)
+        total_chunks = None
 
     return {
-        "uploads": uploads,
-        "metadata_count": len(metadata),
+        "metadata_count": sum(by_status.values()),
+        "status_counts": by_status,
+        "with_extracted_text": with_text,
         "metadata": metadata,
-        "embeddings": embeddings_ids,
-        "cache": cache_files
+        "embeddings_count": total_chunks,
+        "uploads_count": _count_files(UPLOAD_DIR),
+        "cache_count": _count_files(CACHE_DIR),
     }
 
-# @router.post("/reindex")
-# def reindex_documents(db: Session = Depends(get_db)):
-#     # INIT CLIENT
-#     client = get_client("/data/chroma")
-#     collection = client.get_or_create_collection("documents")
-
-#     # 1. CLEAR ALL EMBEDDINGS
-#     try:
-#         collection.delete(where={})  # hapus semua vector
-#     except Exception as e:
-#         print("Error clearing Chroma:", e)
-
-#     # 2. LOAD ALL DOCS
-#     docs = db.query(Document).all()
-
-#     model = SentenceTransformer("all-MiniLM-L6-v2")
-
-#     total_chunks = 0
-
-#     # 3. RE-EMBED
-#     for doc in docs:
-#         if not doc.extracted_text:
-#             continue
-
-#         chunks = chunk_text(doc.extracted_text)
-#         embeddings = model.encode(chunks, convert_to_numpy=True).tolist()
-
-#         ids = [f"{doc.id}-{i}" for i in range(len(chunks))]
-
-#         collection.add(ids=ids, documents=chunks, embeddings=embeddings)
-#         total_chunks += len(chunks)
-
-#     return {
-#         "message": "Reindex complete",
-#         "documents": len(docs),
-#         "chunks_created": total_chunks
-#     }
+@router.post("/reindex", status_code=202)
+def reindex_documents(background_tasks: BackgroundTasks, resume: bool = False):
+    """
+    Bangun ulang seluruh embedding (mis. setelah ganti model) ke shadow
+    collection, lalu swap ke live di akhir. `resume=true` melanjutkan run
+    terakhir yang gagal/terputus dari checkpoint.
+    """
+    # lock reindex (dengan heartbeat) diambil di start_run: run yang pending /
+    # running masih memegangnya, run yang crash melepasnya saat TTL habis
+    state = reindex.start_run(resume=resume)
+    if state is None:
+        raise HTTPException(status_code=409, detail="Reindex is already running")
+    background_tasks.add_task(reindex.run_reindex, state["run_id"])
+    return {"message": "Reindex started", **state}
+
+@router.get("/reindex/status")
+def reindex_status():
+    state = reindex.get_state()
+    if not state:
+        raise HTTPException(status_code=404, detail="No reindex run found")
+    return state
 
 
 # @router.get("/", response_model=list[schemas.DocumentOut])
@@ -106,77 +163,151 @@ def inspect_documents(db: Session = Depends(get_db)):
 #     """Ambil semua dokumen."""
 #     return db.query(models.Document).all()
 
-@router.get("/ask")
-def ask_question(q: str = Query(..., description="Pertanyaan user"), top_k: int = 3):
-    client = get_client("/data/chroma")
-    collection = client.get_or_create_collection("documents")
-
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    query_emb = model.encode([q], convert_to_numpy=True).tolist()[0]
-
-    results = collection.query(query_embeddings=[query_emb], n_results=top_k)
-
-    docs = results.get("documents", [[]])[0]
-    context = "\n\n".join(docs)
-
-    prompt = f"""
-    Gunakan konteks berikut untuk menjawab pertanyaan.
-
-    KONTEKS:
-    {context}
-
-    PERTANYAAN:
-    {q}
-
-    Jawab dengan jelas dan ringkas dalam bahasa Indonesia.
-    """
-
-    answer = generate_answer(prompt)
-    return {"question": q, "answer": answer, "context_used": docs}
-
-@router.get("/query")
-def query_docs(q: str = Query(..., description="Pertanyaan atau kata kunci"),
-               top_k: int = 3):
-    client = get_client("/data/chroma")
-    collection = client.get_or_create_collection("documents")
+def _ask_lookup(q: str, top_k: int) -> dict:
+    """Embed pertanyaan lalu cek answer cache; kalau miss, ambil konteks dari vector store."""
+    settings = get_settings()
+    # collection di-resolve sekali: embedding query memakai model yang di-pin ke collection itu
+    collection = get_collection()
+    with stage("embed"):
+        query_emb = embedder_for(collection).embed_query(q)
+
+    # 0. Semantic answer cache (terikat versi index)
+    answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+    if answer_cache:
+        with stage("answer_cache"):
+            version = get_index_version()
+            hit = answer_cache.lookup(query_emb, top_k, version)
+        if hit:
+            return {"hit": hit}
+    else:
+        version = get_index_version()
+
+    docs = [hit["text"] for hit in hybrid_search(q, top_k, query_emb, collection)]
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    query_emb = model.encode([q], convert_to_numpy=True).tolist()[0]
+    return {
+        "hit": None,
+        "docs": docs,
+        "prompt": build_ask_prompt("\n\n".join(docs), q),
+        "query_emb": query_emb,
+        "version": version,
+        "answer_cache": answer_cache,
+    }
 
-    results = collection.query(
-        query_embeddings=[query_emb],
-        n_results=top_k
-    )
+def _ask_store(lookup: dict, q: str, top_k: int, answer: str) -> None:
+    """Simpan jawaban ke answer cache (Redis sync -> threadpool / background task)."""
+    if lookup["answer_cache"]:
+        lookup["answer_cache"].store(q, lookup["query_emb"], top_k, answer, lookup["docs"], lookup["version"])
 
-    docs = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
+@router.get("/ask")
+async def ask_question(
+    background_tasks: BackgroundTasks,
+    q: str = Query(..., description="Pertanyaan user"),
+    top_k: int = 3,
+):
+    lookup = await run_in_threadpool(_ask_lookup, q, top_k)
+    hit = lookup["hit"]
+    if hit:
+        return {
+            "question": q,
+            "answer": hit["answer"],
+            "context_used": hit["context_used"],
+            "cached": True,
+            "similarity": hit["similarity"],
+        }
 
+    docs = lookup["docs"]
+    answer = await generate_answer(lookup["prompt"])
+    background_tasks.add_task(_ask_store, lookup, q, top_k, answer)
+
+    return {"question": q, "answer": answer, "context_used": docs, "cached": False}
+
+@router.get("/ask/stream")
+async def ask_question_stream(q: str = Query(..., description="Pertanyaan user"), top_k: int = 3):
+    """Versi SSE dari /ask: `meta` -> `token` (berulang) -> `done`."""
+    lookup = await run_in_threadpool(_ask_lookup, q, top_k)
+    hit = lookup["hit"]
+
+    async def event_stream():
+        if hit:
+            yield sse_event("meta", {"question": q, "context_used": hit["context_used"], "cached": True})
+            yield sse_event("token", hit["answer"])
+            yield sse_event("done", {"answer": hit["answer"]})
+            return
+
+        docs = lookup["docs"]
+        parts: list[str] = []
+        yield sse_event("meta", {"question": q, "context_used": docs, "cached": False})
+        try:
+            async for token in stream_answer(lookup["prompt"]):
+                parts.append(token)
+                yield sse_event("token", token)
+        except Exception as e:
+            logger.error(f"Ask stream error: {e}")
+            yield sse_event("error", {"detail": "LLM stream failed"})
+            return
+
+        answer = "".join(parts)
+        yield sse_event("done", {"answer": answer})
+        await run_in_threadpool(_ask_store, lookup, q, top_k, answer)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _format_hits(hits: list[dict]) -> list[dict]:
     combined = []
-    for i, d in enumerate(docs):
-        meta = metas[i] if i < len(metas) else {}
+    for i, hit in enumerate(hits):
+        meta = hit["metadata"]
         combined.append({
             "rank": i + 1,
             "document_id": meta.get("document_id"),
             "chunk_index": meta.get("chunk_index"),
-            "content": d
+            "page": meta.get("page"),
+            "char_start": meta.get("char_start"),
+            "char_end": meta.get("char_end"),
+            "score": hit.get("score"),
+            "content": hit["text"]
         })
+    return combined
 
-    return {"query": q, "results": combined}
+@router.get("/query")
+def query_docs(q: str = Query(..., description="Pertanyaan atau kata kunci"),
+               top_k: int = 3):
+    return {"query": q, "results": _format_hits(hybrid_search(q, top_k))}
+
+@router.post("/query/batch")
+def query_docs_batch(payload: schemas.DocumentQueryBatch):
+    """
+    Versi batch dari /query: semua query di-encode dalam satu panggilan dan
+    dicari dalam satu query vector store. Urutan hasil = urutan `queries`.
+    """
+    max_batch = get_settings().QUERY_BATCH_MAX
+    if len(payload.queries) > max_batch:
+        raise HTTPException(status_code=422, detail=f"Maximum {max_batch} queries per batch")
+
+    hits = hybrid_search_batch(payload.queries, payload.top_k)
+    return {
+        "results": [
+            {"query": q, "results": _format_hits(h)}
+            for q, h in zip(payload.queries, hits)
+        ]
+    }
 
 @router.post("/embed/{doc_id}")
 def embed_doc(doc_id: str, db: Session = Depends(get_db)):
     doc = db.query(models.Document).filter(models.Document.id == doc_id).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    if not doc.extracted_text:
+    if not doc.text_chars:
         raise HTTPException(status_code=400, detail="Document has no extracted text yet")
 
-    count = store_embeddings(str(doc.id), doc.extracted_text)
+    result = store_embeddings(str(doc.id), iter_stored_pages(db, doc.id))
     doc.status = "embedded"
     db.commit()
     db.refresh(doc)
 
-    return {"message": f"{count} chunks embedded for document {doc.filename}"}
+    return {
+        "message": f"{result['total']} chunks embedded for document {doc.filename}",
+        **result,
+    }
 
 
 @router.post("/extract/{doc_id}", response_model=schemas.DocumentOut)
@@ -185,15 +316,15 @@ def extract_doc(doc_id: str, db: Session = Depends(get_db)):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    settings = get_settings()
-    path = os.path.join(settings.UPLOAD_DIR, f"{doc.id}{os.path.splitext(doc.filename)[1]}")
+    path = _upload_path(doc)
 
     try:
-        content = extract_text(path, doc.filetype)
+        # halaman disimpan sambil diekstrak (tidak ditampung utuh di memori)
+        save_pages(db, doc, iter_pages(path, doc.filetype))
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-    doc.extracted_text = content
     doc.status = "extracted"
     db.commit()
     db.refresh(doc)
@@ -250,6 +381,7 @@ async def upload_doc(
     db.add(doc)
     db.commit()
     db.refresh(doc)
+    bump_index_version()
 
     return doc
 
@@ -261,9 +393,7 @@ def delete_document(doc_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Document not found")
 
     # 1. Hapus file upload
-    file_path = os.path.join(UPLOAD_DIR, doc.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    _remove_upload(doc)
 
     # 2. Hapus embeddings
     delete_document_embeddings(doc_id)
@@ -282,6 +412,30 @@ def delete_document(doc_id: str, db: Session = Depends(get_db)):
         }
     }
 
+@router.post("/bulk-delete")
+def bulk_delete_documents(payload: schemas.DocumentBulkDelete, db: Session = Depends(get_db)):
+    ids = list(dict.fromkeys(payload.ids))
+    docs = db.query(Document).filter(Document.id.in_(ids)).all()
+    found = {doc.id for doc in docs}
+
+    # 1. Hapus file upload
+    for doc in docs:
+        _remove_upload(doc)
+
+    # 2. Hapus embeddings (satu panggilan untuk semua dokumen)
+    delete_documents_embeddings([str(i) for i in found])
+
+    # 3. Hapus row metadata
+    for doc in docs:
+        db.delete(doc)
+    db.commit()
+
+    return {
+        "message": f"{len(found)} documents deleted",
+        "deleted": [str(i) for i in ids if i in found],
+        "not_found": [str(i) for i in ids if i not in found],
+    }
+
 # @router.delete("/")
 # def delete_all_documents(db: Session = Depends(get_db)):
 
@@ -298,68 +452,55 @@ def delete_document(doc_id: str, db: Session = Depends(get_db)):
 #         shutil.rmtree(chroma_dir)
 #         os.makedirs(chroma_dir)
 
-#     # 3. Hapus extracted_text + rows
+#     # 3. Hapus rows (document_pages ikut terhapus lewat ON DELETE CASCADE)
 #     db.query(Document).delete()
 #     db.commit()
 
 #     return {"message": "All documents + extract + embeddings deleted successfully"}
 
-@router.post("/process")
+@router.post("/process", status_code=202)
 async def process_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # -------------------------------
-    # 1. UPLOAD
-    # -------------------------------
-    filename = file.filename
-    save_path = os.path.join(UPLOAD_DIR, filename)
-
-    # simpan file fisik
-    with open(save_path, "wb") as f:
-        f.write(await file.read())
+    """
+    Simpan file lalu daftarkan job ingestion (extract -> chunk -> embed) ke
+    queue Redis. Langsung return job_id; progress bisa dipantau lewat
+    GET /docs/jobs/{job_id} atau status dokumen.
+    """
+    settings = get_settings()
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
     # buat metadata di DB
-    doc = Document(filename=filename, filetype=file.content_type)
+    doc = Document(filename=file.filename, filetype=file.content_type, status="uploaded")
     db.add(doc)
     db.commit()
     db.refresh(doc)
 
-    # -------------------------------
-    # 2. EXTRACT
-    # -------------------------------
-    extracted_text = extract_text(save_path, file.content_type)
-
-    if not extracted_text or len(extracted_text.strip()) < 5:
-        raise HTTPException(status_code=400, detail="Failed to extract text")
-
-    doc.extracted_text = extracted_text
-    doc.status = "extracted"
-    db.commit()
-
-    # -------------------------------
-    # 3. EMBED
-    # -------------------------------
-    # chunking
-    chunks = chunk_text(extracted_text)
-
-    # embedding
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(chunks, convert_to_numpy=True).tolist()
-
-    # simpan ke Chroma
-    client = get_client("/data/chroma")
-    collection = client.get_or_create_collection("documents")
-
-    ids = [f"{doc.id}-{i}" for i in range(len(chunks))]
-    collection.add(ids=ids, documents=chunks, embeddings=embeddings)
+    # simpan file fisik (streaming per 1MB)
+    save_path = _upload_path(doc)
+    with open(save_path, "wb") as out:
+        while chunk := await file.read(1024 * 1024):
+            out.write(chunk)
 
-    doc.status = "embedded"
-    db.commit()
+    job_id = enqueue_ingestion(str(doc.id), save_path, file.content_type)
+    bump_index_version()
 
     return {
         "doc_id": str(doc.id),
-        "filename": filename,
-        "message": "Upload + extract + embed completed",
-        "chunks_created": len(chunks)
+        "job_id": job_id,
+        "filename": doc.filename,
+        "status": doc.status,
+        "message": "Upload accepted, ingestion queued",
     }
 
-
-
+@router.get("/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{doc_id}/status")
+def get_document_status(doc_id: str, db: Session = Depends(get_db)):
+    row = db.query(Document.id, Document.status).filter(Document.id == doc_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"doc_id": str(row.id), "status": row.status}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID
 
@@ -15,3 +15,12 @@ class DocumentOut(DocumentBase):
 
     class Config:
         from_attributes = True
+
+
+class DocumentBulkDelete(BaseModel):
+    ids: list[UUID]
+
+
+class DocumentQueryBatch(BaseModel):
+    queries: list[str] = Field(..., min_length=1)
+    top_k: int = 3
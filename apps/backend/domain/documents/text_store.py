@@ -0,0 +1,92 @@
+from typing import Iterable, Iterator
+
+import zstandard
+
+from sqlalchemy.orm import Session
+
+from domain.documents.models import Document, DocumentPage
+
+ZSTD_LEVEL = 6
+FLUSH_PAGES = 32  # halaman per flush saat menyimpan secara streaming
+
+
+def compress_text(text: str) -> bytes:
+    # compressor zstd tidak thread-safe -> buat per panggilan (murah)
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(text.encode("utf-8"))
+
+
+def decompress_text(data: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+
+def iter_save_pages(db: Session, doc: Document, pages: Iterable[dict]) -> Iterator[dict]:
+    """
+    Simpan halaman sambil diteruskan ke konsumen (mis. chunker), sehingga
+    dokumen tidak pernah utuh di memori. Halaman lama dihapus saat halaman
+    pertama tiba (ekstraksi kosong tidak menghapus apa-apa); row di-flush
+    per FLUSH_PAGES lalu dilepas dari session. Commit dilakukan caller.
+    """
+    pending: list[DocumentPage] = []
+    count = chars = 0
+    for p in pages:
+        if count == 0:
+            db.query(DocumentPage).filter(DocumentPage.document_id == doc.id).delete(synchronize_session=False)
+        row = DocumentPage(
+            document_id=doc.id,
+            page=p["page"],
+            char_count=len(p["text"]),
+            content=compress_text(p["text"]),
+        )
+        db.add(row)
+        pending.append(row)
+        count += 1
+        chars += len(p["text"])
+        if len(pending) >= FLUSH_PAGES:
+            _flush_pages(db, pending)
+        yield p
+    _flush_pages(db, pending)
+    if count:
+        doc.page_count = count
+        doc.text_chars = chars
+
+
+def _flush_pages(db: Session, rows: list[DocumentPage]) -> None:
+    if rows:
+        db.flush()
+        for row in rows:
+            db.expunge(row)
+        rows.clear()
+
+
+def save_pages(db: Session, doc: Document, pages: Iterable[dict]) -> None:
+    """
+    Simpan teks hasil ekstraksi per halaman (terkompresi zstd) di tabel
+    document_pages, menggantikan versi sebelumnya. Commit dilakukan caller.
+    """
+    for _ in iter_save_pages(db, doc, pages):
+        pass
+
+
+def iter_stored_pages(
+    db: Session, doc_id, first: int = None, last: int = None, limit: int = None
+) -> Iterator[dict]:
+    """Stream teks per halaman {"page": n, "text": ...} dari Postgres (server-side batch)."""
+    q = db.query(DocumentPage.page, DocumentPage.content).filter(DocumentPage.document_id == doc_id)
+    if first is not None:
+        q = q.filter(DocumentPage.page >= first)
+    if last is not None:
+        q = q.filter(DocumentPage.page <= last)
+    q = q.order_by(DocumentPage.page)
+    if limit is not None:
+        q = q.limit(limit)
+    for row in q.yield_per(FLUSH_PAGES):
+        yield {"page": row.page, "text": decompress_text(row.content)}
+
+
+def load_pages(db: Session, doc_id, first: int = None, last: int = None, limit: int = None) -> list[dict]:
+    """Teks per halaman {"page": n, "text": ...}, opsional hanya rentang first..last."""
+    return list(iter_stored_pages(db, doc_id, first, last, limit))
+
+
+def load_text(db: Session, doc_id) -> str:
+    return "\n".join(p["text"] for p in load_pages(db, doc_id))
@@ -0,0 +1,532 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, NamedTuple
+
+import numpy as np
+
+from core.logger import logger
+
+VECTORS_FILE = "vectors.npy"   # matriks float16/int8 (capacity x dim), di-mmap
+META_FILE = "meta.json"        # {"dtype", "dim"} ditetapkan saat write pertama
+SCALE_FILE = "scale.npy"       # skala per dimensi (khusus int8)
+RECORDS_FILE = "records.bin"   # JSON {"document", "metadata"} per row, append-only
+LOG_FILE = "log.jsonl"         # operasi add/del/meta, append-only (sumber kebenaran)
+SCORE_BLOCK = 65536            # row per blok matmul (-> float32)
+MIN_CAPACITY = 1024
+DTYPES = {"float16": np.float16, "int8": np.int8}
+INT8_HEADROOM = 1.5            # ruang untuk nilai di luar batch kalibrasi pertama
+
+
+class _Snapshot(NamedTuple):
+    """State satu pembacaan; tetap valid walau compaction/swap terjadi setelahnya."""
+    ids: list[str]
+    offsets: list[tuple[int, int]]
+    alive: np.ndarray
+    vectors: np.ndarray | None
+    scale: np.ndarray | None
+    records: BinaryIO | None
+
+
+class NumpyCollection:
+    """
+    Index vector exact-search in-process, subset API chromadb.Collection
+    (get / query / upsert / update / delete / count).
+
+    - embedding disimpan ter-normalisasi di `vectors.npy` yang di-memory-map,
+      sebagai float16 (2x lebih kecil dari float32) atau int8 dengan skala
+      per dimensi (4x); query = satu matmul per blok + argpartition (cosine,
+      distance = 1 - similarity). Untuk int8, skala dilipat ke vector query
+      sehingga tidak perlu dekuantisasi matriks.
+    - id, document_id, dan offset record disimpan ringkas di memori;
+      teks + metadata dibaca dari `records.bin` hanya untuk hasil top-k
+    - delete = tombstone, update = record baru (record lama jadi sampah);
+      compaction menulis ulang collection ke direktori baru lalu di-rename,
+      otomatis saat tombstone + record usang melewati `compact_ratio`
+    - beberapa proses boleh memakai direktori yang sama: penulisan di-lock
+      dengan flock exclusive, pembaca mengambil snapshot (termasuk fd
+      records.bin) di bawah flock shared, lalu mengikuti ekor log dan
+      mendeteksi file/direktori yang diganti (growth, compaction, swap) lewat inode
+
+    Filter `where` hanya mendukung `document_id` (sama dengan atau `$in`),
+    satu-satunya filter yang dipakai aplikasi.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str = None,
+        dtype: str = "float16",
+        compact_ratio: float = 0.2,
+        compact_min: int = 1000,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype index tidak dikenal: {dtype}")
+        self.path = path
+        self.dtype = dtype  # hanya untuk collection baru; collection lama pakai meta.json
+        self.name = name or os.path.basename(path)
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self._lock = threading.RLock()
+        self._reset()
+
+    # --- state in-memory -------------------------------------------------
+
+    def _reset(self) -> None:
+        self._dir_ino = None
+        self._log_pos = 0
+        self._ids: list[str] = []
+        self._doc_ids: list[str] = []
+        self._offsets: list[tuple[int, int]] = []
+        self._alive = bytearray()
+        self._row_of: dict[str, int] = {}
+        self._rows_of_doc: dict[str, set[int]] = {}  # document_id -> row hidup
+        self._stale = 0  # record usang (di-update) yang masih ada di records.bin / log
+        self._vectors: np.ndarray | None = None
+        self._vectors_ino = None
+        self._meta: dict | None = None
+        self._scale: np.ndarray | None = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _apply(self, op: dict) -> None:
+        kind = op["op"]
+        if kind == "add":
+            row = len(self._ids)
+            self._ids.append(op["id"])
+            self._doc_ids.append(op["doc"])
+            self._offsets.append((op["off"], op["len"]))
+            self._alive.append(1)
+            self._row_of[op["id"]] = row
+            self._rows_of_doc.setdefault(op["doc"], set()).add(row)
+        elif kind == "del":
+            row = op["row"]
+            self._alive[row] = 0
+            if self._row_of.get(self._ids[row]) == row:
+                del self._row_of[self._ids[row]]
+            self._unlink_doc(row)
+        elif kind == "meta":
+            row = op["row"]
+            self._offsets[row] = (op["off"], op["len"])
+            self._stale += 1
+            doc = op.get("doc", self._doc_ids[row])
+            if doc != self._doc_ids[row]:
+                self._unlink_doc(row)
+                self._doc_ids[row] = doc
+                self._rows_of_doc.setdefault(doc, set()).add(row)
+
+    def _unlink_doc(self, row: int) -> None:
+        rows = self._rows_of_doc.get(self._doc_ids[row])
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self._rows_of_doc[self._doc_ids[row]]
+
+    def _refresh(self) -> None:
+        """Ikuti perubahan dari proses lain (ekor log + file yang diganti)."""
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self._reset()
+            return
+        if ino != self._dir_ino:
+            # direktori diganti (compaction / swap) -> muat ulang penuh
+            self._reset()
+            self._dir_ino = ino
+
+        if self._meta is None and os.path.exists(self._file(META_FILE)):
+            with open(self._file(META_FILE)) as f:
+                self._meta = json.load(f)
+            if self._meta["dtype"] == "int8":
+                self._scale = np.load(self._file(SCALE_FILE))
+
+        try:
+            size = os.path.getsize(self._file(LOG_FILE))
+        except FileNotFoundError:
+            size = 0
+        if size > self._log_pos:
+            with open(self._file(LOG_FILE), "rb") as f:
+                f.seek(self._log_pos)
+                data = f.read(size - self._log_pos)
+            end = data.rfind(b"\n") + 1  # baris terakhir yang belum lengkap dilewati
+            for line in data[:end].splitlines():
+                self._apply(json.loads(line))
+            self._log_pos += end
+
+        try:
+            vino = os.stat(self._file(VECTORS_FILE)).st_ino
+        except FileNotFoundError:
+            return
+        if vino != self._vectors_ino:
+            self._vectors = np.load(self._file(VECTORS_FILE), mmap_mode="r")
+            self._vectors_ino = vino
+
+    def _alive_mask(self) -> np.ndarray:
+        return np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+
+    # --- kuantisasi ----------------------------------------------------------
+
+    def _init_meta(self, vecs: np.ndarray) -> None:
+        """Tetapkan dtype (+ skala int8 dari batch pertama) untuk collection baru."""
+        dim = vecs.shape[1]
+        if self._vectors is not None:
+            # collection lama tanpa meta.json: ikuti dtype matriks yang sudah ada
+            self.dtype = self._vectors.dtype.name
+        if self.dtype == "int8":
+            # batas bawah ~4 sigma komponen vector unit acak, untuk batch kecil
+            floor = 4 / np.sqrt(dim)
+            scale = np.maximum(np.abs(vecs).max(axis=0) * INT8_HEADROOM, floor) / 127
+            np.save(self._file(SCALE_FILE), scale.astype(np.float32))
+        with open(self._file(META_FILE), "w") as f:
+            json.dump({"dtype": self.dtype, "dim": dim}, f)
+        self._refresh()
+
+    def _encode(self, vecs: np.ndarray) -> np.ndarray:
+        if self._meta["dim"] != vecs.shape[1]:
+            raise ValueError(f"Dimensi embedding {vecs.shape[1]} != dimensi index {self._meta['dim']}")
+        if self._meta["dtype"] == "int8":
+            return np.clip(np.rint(vecs / self._scale), -127, 127).astype(np.int8)
+        return vecs.astype(np.float16)
+
+    def storage(self) -> dict:
+        """Ukuran penyimpanan vector (untuk sizing / benchmark)."""
+        with self._reading():
+            path = self._file(VECTORS_FILE)
+            return {
+                "dtype": self._meta["dtype"] if self._meta else self.dtype,
+                "rows": len(self._ids),
+                "vectors_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+                "bytes_per_vector": self._vectors.dtype.itemsize * self._vectors.shape[1] if self._vectors is not None else None,
+            }
+
+    # --- penulisan ---------------------------------------------------------
+
+    @contextmanager
+    def _flock(self, mode: int):
+        # lock file di luar direktori collection supaya tetap valid saat direktori di-rename
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, self._flock(fcntl.LOCK_EX):
+            self._refresh()
+            yield
+
+    @contextmanager
+    def _reading(self):
+        """
+        Refresh di bawah flock shared, sehingga compaction / swap dari proses
+        lain tidak bisa menyisip sebelum snapshot (dan fd records.bin-nya)
+        diambil.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, self._flock(fcntl.LOCK_SH):
+            self._refresh()
+            yield
+
+    def _snapshot(self) -> _Snapshot:
+        """
+        Dipanggil di dalam `_reading()`. List id/offset dipakai per referensi:
+        add hanya menambah row di belakang, compaction/swap membuat list baru,
+        dan offset hasil update tetap menunjuk ke records.bin yang sama.
+        """
+        path = self._file(RECORDS_FILE)
+        return _Snapshot(
+            ids=self._ids,
+            offsets=self._offsets,
+            alive=self._alive_mask(),
+            vectors=self._vectors,
+            scale=self._scale,
+            records=open(path, "rb") if os.path.exists(path) else None,
+        )
+
+    def _write_vectors(self, start: int, vecs: np.ndarray) -> None:
+        path = self._file(VECTORS_FILE)
+        needed = start + len(vecs)
+        current = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+        if current is None or current.shape[0] < needed:
+            # tumbuh 2x: tulis file baru lalu os.replace (pembaca lama tetap valid)
+            capacity = max(MIN_CAPACITY, needed, 2 * (current.shape[0] if current is not None else 0))
+            tmp = self._file(f"{VECTORS_FILE}.tmp")
+            grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=vecs.dtype, shape=(capacity, vecs.shape[1]))
+            for s in range(0, start, SCORE_BLOCK):
+                grown[s:min(start, s + SCORE_BLOCK)] = current[s:min(start, s + SCORE_BLOCK)]
+            grown.flush()
+            del grown
+            os.replace(tmp, path)
+
+        out = np.lib.format.open_memmap(path, mode="r+")
+        out[start:needed] = vecs
+        out.flush()
+        del out
+
+    def _write_records(self, items: list[dict]) -> list[tuple[int, int]]:
+        offsets = []
+        with open(self._file(RECORDS_FILE), "ab") as f:
+            pos = f.tell()
+            for item in items:
+                raw = json.dumps(item, ensure_ascii=False).encode("utf-8")
+                f.write(raw)
+                offsets.append((pos, len(raw)))
+                pos += len(raw)
+        return offsets
+
+    def _write_log(self, ops: list[dict]) -> None:
+        with open(self._file(LOG_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(op) + "\n" for op in ops))
+        self._refresh()
+
+    def _delete_rows(self, rows) -> None:
+        if rows:
+            self._write_log([{"op": "del", "row": r} for r in rows])
+
+    def _maybe_compact(self) -> None:
+        # sampah = row tombstone + record usang hasil update (records.bin & log ikut tumbuh)
+        dead = len(self._ids) - int(self._alive_mask().sum()) + self._stale
+        if dead >= self.compact_min and dead > self.compact_ratio * len(self._ids):
+            self._compact()
+
+    # --- API Chroma ----------------------------------------------------------
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str] = None, metadatas: list[dict] = None) -> None:
+        if not ids:
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        # id duplikat dalam satu batch: yang terakhir menang
+        latest = {cid: i for i, cid in enumerate(ids)}
+        order = sorted(latest.values())
+
+        vecs = np.asarray(embeddings, dtype=np.float32)[order]
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1, norms)
+
+        with self._writing():
+            if self._meta is None:
+                self._init_meta(vecs)
+            replaced = [self._row_of[ids[i]] for i in order if ids[i] in self._row_of]
+            start = len(self._ids)
+            self._write_vectors(start, self._encode(vecs))
+            offsets = self._write_records([
+                {"document": documents[i], "metadata": metadatas[i] or {}} for i in order
+            ])
+            ops = [{"op": "del", "row": r} for r in replaced]
+            ops += [
+                {"op": "add", "id": ids[i], "doc": (metadatas[i] or {}).get("document_id"), "off": off, "len": length}
+                for i, (off, length) in zip(order, offsets)
+            ]
+            self._write_log(ops)
+            self._maybe_compact()
+
+    add = upsert
+
+    def update(self, ids: list[str], metadatas: list[dict] = None, documents: list[str] = None) -> None:
+        with self._writing():
+            targets = [(i, self._row_of[cid]) for i, cid in enumerate(ids) if cid in self._row_of]
+            if not targets:
+                return
+            with open(self._file(RECORDS_FILE), "rb") as f:
+                current = _read_records(f, self._offsets, [row for _, row in targets])
+            items = []
+            for (i, _), record in zip(targets, current):
+                items.append({
+                    "document": documents[i] if documents else record["document"],
+                    "metadata": metadatas[i] if metadatas else record["metadata"],
+                })
+            offsets = self._write_records(items)
+            self._write_log([
+                {"op": "meta", "row": row, "doc": (item["metadata"] or {}).get("document_id"), "off": off, "len": length}
+                for (_, row), item, (off, length) in zip(targets, items, offsets)
+            ])
+            self._maybe_compact()
+
+    def delete(self, ids: list[str] = None, where: dict = None) -> None:
+        with self._writing():
+            self._delete_rows(self._select_rows(ids, where))
+            self._maybe_compact()
+
+    def count(self) -> int:
+        with self._reading():
+            return int(self._alive_mask().sum())
+
+    def get(self, ids: list[str] = None, where: dict = None, include: list[str] = None, limit: int = None, offset: int = 0) -> dict:
+        include = ["documents", "metadatas"] if include is None else include
+        with self._reading():
+            rows = self._select_rows(ids, where)
+            if limit is not None:
+                rows = rows[offset:offset + limit]
+            snap = self._snapshot()
+        try:
+            return _result(snap, rows, include)
+        finally:
+            if snap.records:
+                snap.records.close()
+
+    def query(self, query_embeddings, n_results: int = 10, include: list[str] = None, where: dict = None) -> dict:
+        if where:
+            raise ValueError("NumpyCollection.query tidak mendukung filter where")
+        include = ["documents", "metadatas", "distances"] if include is None else include
+
+        q = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1, norms)
+
+        # scoring + baca record di luar lock, seluruhnya dari snapshot
+        with self._reading():
+            snap = self._snapshot()
+        try:
+            return self._query(snap, q, n_results, include)
+        finally:
+            if snap.records:
+                snap.records.close()
+
+    def _query(self, snap: _Snapshot, q: np.ndarray, n_results: int, include: list[str]) -> dict:
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, int(snap.alive.sum()))
+        if k == 0 or snap.vectors is None:
+            for key in out:
+                out[key] = [[] for _ in range(len(q))]
+            return _filter_include(out, include)
+
+        scores = self._scores(snap, q)
+        for row_scores in scores:
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top])]
+            result = _result(snap, top.tolist(), include)
+            out["ids"].append(result["ids"])
+            out["documents"].append(result["documents"])
+            out["metadatas"].append(result["metadatas"])
+            out["distances"].append((1.0 - row_scores[top]).tolist())
+        return _filter_include(out, include)
+
+    @staticmethod
+    def _scores(snap: _Snapshot, q: np.ndarray) -> np.ndarray:
+        if snap.scale is not None:
+            # skor = q . (code * scale) = (q * scale) . code
+            q = q * snap.scale
+        total = len(snap.alive)
+        scores = np.empty((len(q), total), dtype=np.float32)
+        for s in range(0, total, SCORE_BLOCK):
+            e = min(total, s + SCORE_BLOCK)
+            scores[:, s:e] = q @ snap.vectors[s:e].astype(np.float32).T
+        scores[:, ~snap.alive] = -np.inf
+        return scores
+
+    # --- baca ------------------------------------------------------------------
+
+    def _select_rows(self, ids: list[str] = None, where: dict = None) -> list[int]:
+        wanted = None
+        if where:
+            if set(where) != {"document_id"}:
+                raise ValueError(f"Filter where tidak didukung: {where}")
+            cond = where["document_id"]
+            wanted = set(cond["$in"]) if isinstance(cond, dict) else {cond}
+
+        if ids is not None:
+            rows = [self._row_of[cid] for cid in ids if cid in self._row_of]
+            if wanted is not None:
+                rows = [r for r in rows if self._doc_ids[r] in wanted]
+            return rows
+        if wanted is not None:
+            # lewat index document_id: sebanding dengan jumlah chunk dokumen, bukan corpus
+            return sorted(r for doc in wanted for r in self._rows_of_doc.get(doc, ()))
+        return np.flatnonzero(self._alive_mask()).tolist()
+
+    # --- compaction --------------------------------------------------------------
+
+    def compact(self) -> None:
+        with self._writing():
+            self._compact()
+
+    def _compact(self) -> None:
+        """Tulis ulang row yang masih hidup ke direktori baru, lalu tukar direktori."""
+        rows = np.flatnonzero(self._alive_mask())
+        tmp_dir = f"{self.path}.compact"
+        old_dir = f"{self.path}.old"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        if self._meta is not None:
+            shutil.copy(self._file(META_FILE), os.path.join(tmp_dir, META_FILE))
+        if len(rows) and self._vectors is not None:
+            self._compact_vectors(rows, tmp_dir)
+
+        ops = []
+        with open(os.path.join(tmp_dir, RECORDS_FILE), "wb") as rec, open(self._file(RECORDS_FILE), "rb") as src:
+            pos = 0
+            for row in rows.tolist():
+                off, length = self._offsets[row]
+                src.seek(off)
+                rec.write(src.read(length))
+                ops.append({"op": "add", "id": self._ids[row], "doc": self._doc_ids[row], "off": pos, "len": length})
+                pos += length
+        with open(os.path.join(tmp_dir, LOG_FILE), "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(op) + "\n" for op in ops))
+
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.rename(self.path, old_dir)
+        os.rename(tmp_dir, self.path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        logger.info(f"Numpy index {self.name} compacted: {len(self._ids)} -> {len(rows)} rows")
+        self._refresh()
+
+    def _compact_vectors(self, rows: np.ndarray, tmp_dir: str) -> None:
+        dim = self._vectors.shape[1]
+        out = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, VECTORS_FILE), mode="w+", dtype=self._vectors.dtype,
+            shape=(max(MIN_CAPACITY, len(rows)), dim),
+        )
+        blocks = [rows[s:s + SCORE_BLOCK] for s in range(0, len(rows), SCORE_BLOCK)]
+
+        if self._scale is None:
+            for i, block in enumerate(blocks):
+                out[i * SCORE_BLOCK:i * SCORE_BLOCK + len(block)] = self._vectors[block]
+        else:
+            # int8: kalibrasi ulang skala per dimensi dari seluruh row yang hidup
+            peak = np.zeros(dim, dtype=np.float32)
+            for block in blocks:
+                peak = np.maximum(peak, np.abs(self._vectors[block]).max(axis=0) * self._scale)
+            scale = np.maximum(peak, 1e-6) / 127
+            for i, block in enumerate(blocks):
+                values = self._vectors[block].astype(np.float32) * self._scale
+                out[i * SCORE_BLOCK:i * SCORE_BLOCK + len(block)] = np.clip(np.rint(values / scale), -127, 127)
+            np.save(os.path.join(tmp_dir, SCALE_FILE), scale.astype(np.float32))
+
+        out.flush()
+        del out
+
+
+def _read_records(f: BinaryIO, offsets: list[tuple[int, int]], rows: list[int]) -> list[dict]:
+    records = []
+    for row in rows:
+        off, length = offsets[row]
+        f.seek(off)
+        records.append(json.loads(f.read(length)))
+    return records
+
+
+def _result(snap: _Snapshot, rows: list[int], include: list[str]) -> dict:
+    wants_records = "documents" in include or "metadatas" in include
+    records = _read_records(snap.records, snap.offsets, rows) if wants_records and rows else []
+    return {
+        "ids": [snap.ids[r] for r in rows],
+        "documents": [r["document"] for r in records] if "documents" in include else None,
+        "metadatas": [r["metadata"] for r in records] if "metadatas" in include else None,
+    }
+
+
+def _filter_include(out: dict, include: list[str]) -> dict:
+    return {k: (v if k == "ids" or k in include else None) for k, v in out.items()}
+
@@ -0,0 +1,35 @@
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+
+def keyset_page(query, sort_cols, pivot, limit: int, before: bool, newest_first: bool):
+    """
+    Keyset pagination di atas (sort_cols) — tanpa OFFSET, jadi latency tetap
+    datar walaupun tabel berisi jutaan baris.
+
+    before=True  -> baris yang lebih tua dari pivot (tanpa pivot: halaman terbaru)
+    before=False -> baris yang lebih baru dari pivot
+    """
+    key = tuple_(*sort_cols)
+    if pivot is not None:
+        pivot_key = tuple_(*[getattr(pivot, c.key) for c in sort_cols])
+        query = query.filter(key < pivot_key if before else key > pivot_key)
+
+    # ambil dari sisi yang dekat pivot, lalu urutkan sesuai tampilan
+    desc = before
+    order = [c.desc() for c in sort_cols] if desc else [c.asc() for c in sort_cols]
+    rows = query.order_by(*order).limit(limit).all()
+    if desc != newest_first:
+        rows.reverse()
+    return rows
+
+
+def get_pivot(db: Session, model, sort_cols, pivot_id: str | None):
+    """Ambil nilai kolom urutan milik baris cursor (hanya kolom itu, bukan seluruh row)."""
+    if pivot_id is None:
+        return None
+    row = db.query(*sort_cols).filter(model.id == pivot_id).first()
+    if not row:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return row
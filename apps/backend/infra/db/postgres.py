@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from core.config import get_settings
+from core.metrics import record_stage
 
 settings = get_settings()
 
@@ -10,6 +13,19 @@ engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# setiap query Postgres dihitung sebagai stage "db" (metrics + Server-Timing)
+@event.listens_for(engine, "before_cursor_execute")
+def _query_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _query_end(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start", None)
+    if started is not None:
+        record_stage("db", time.perf_counter() - started)
+
+
 def get_db():
     """Dependency untuk FastAPI endpoint."""
     db = SessionLocal()
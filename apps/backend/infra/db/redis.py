@@ -0,0 +1,20 @@
+from functools import lru_cache
+
+import redis
+
+from core.config import get_settings
+
+
+@lru_cache
+def get_redis() -> redis.Redis:
+    """
+    Client Redis tunggal per proses (connection pool bawaan redis-py).
+    decode_responses=False karena sebagian nilai disimpan sebagai bytes.
+    """
+    settings = get_settings()
+    return redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+    )
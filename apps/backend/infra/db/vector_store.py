@@ -0,0 +1,297 @@
+import json
+import os
+import shutil
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import chromadb
+
+from core.config import get_settings
+from core.logger import logger
+from infra.db.numpy_index import NumpyCollection
+from infra.db.redis import get_redis
+
+DEFAULT_COLLECTION = "documents"
+POINTER_PREFIX = "vector:live:"  # nama logis -> nama collection fisik
+MODEL_PREFIX = "vector:model:"  # collection fisik -> model embedding yang mengisinya
+
+
+class VectorStore:
+    """
+    Client Chroma jangka panjang per proses.
+
+    - mode "local": PersistentClient di `persist_dir` (embedded, SQLite)
+    - mode "http" : HttpClient ke server Chroma di `url`, sehingga beberapa
+      worker API bisa berbagi satu server yang sama
+    - mode "numpy": NumpyCollection di `numpy_dir` (float16 mmap, exact
+      search), API-nya subset dari chromadb.Collection
+
+    Nama collection yang dipakai aplikasi ("documents") adalah nama logis:
+    collection fisiknya ditunjuk oleh pointer di Redis (`vector:live:{nama}`;
+    tanpa pointer = nama itu sendiri). Swap setelah reindex cukup mengganti
+    pointer dengan satu SET, sehingga tidak pernah ada saat collection live
+    kosong / tidak ada.
+
+    Setiap collection fisik di-pin ke model embedding yang mengisinya
+    (`vector:model:{fisik}`), sehingga query dan ingestion live memakai model
+    milik collection yang ditunjuk pointer dan ikut berganti saat swap.
+
+    Client dan handle collection dibuat sekali lalu di-cache. Pointer
+    di-resolve ulang setiap `handle_ttl` detik untuk pembacaan; penulisan
+    memakai `fresh=True` supaya langsung mengikuti swap. Pointer terakhir
+    yang terbaca disalin ke `pointer_file`; saat Redis tidak bisa dihubungi
+    salinan itu yang dipakai, dan penulisan gagal kalau pointer sama sekali
+    tidak diketahui (bukan diam-diam menulis ke collection pra-swap).
+    """
+
+    def __init__(
+        self,
+        mode: str = "local",
+        url: str | None = None,
+        persist_dir: str = "/data/chroma",
+        handle_ttl: float = 30.0,
+        numpy_dir: str = "/data/vectors",
+        numpy_dtype: str = "float16",
+        compact_ratio: float = 0.2,
+        pointer_file: str | None = None,
+    ):
+        self.mode = mode
+        self.url = url
+        self.persist_dir = persist_dir
+        self.handle_ttl = handle_ttl
+        self.numpy_dir = numpy_dir
+        self.numpy_dtype = numpy_dtype
+        self.compact_ratio = compact_ratio
+        self.pointer_file = pointer_file
+        self._numpy: dict[str, NumpyCollection] = {}
+        self._client = None
+        self._collections: dict[str, tuple[chromadb.Collection, float]] = {}
+        self._pointers: dict[str, tuple[str, float]] = {}
+        self._models: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _create_client(self):
+        if self.mode == "http":
+            if not self.url:
+                raise ValueError("VECTOR_DB_URL wajib diisi untuk VECTOR_DB_MODE=http")
+            parsed = urlparse(self.url)
+            ssl = parsed.scheme == "https"
+            port = parsed.port or (443 if ssl else 8000)
+            logger.info(f"Connecting to Chroma server at {parsed.hostname}:{port}")
+            return chromadb.HttpClient(host=parsed.hostname, port=port, ssl=ssl)
+
+        if self.mode == "local":
+            logger.info(f"Opening embedded Chroma at {self.persist_dir}")
+            return chromadb.PersistentClient(path=self.persist_dir)
+
+        raise ValueError(f"VECTOR_DB_MODE tidak dikenal: {self.mode}")
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _fresh(self, name: str) -> chromadb.Collection | None:
+        cached = self._collections.get(name)
+        if cached and time.monotonic() - cached[1] < self.handle_ttl:
+            return cached[0]
+        return None
+
+    def _numpy_collection(self, name: str) -> NumpyCollection:
+        # instance dipakai terus: perubahan dari proses lain diikuti sendiri lewat log
+        with self._lock:
+            if name not in self._numpy:
+                self._numpy[name] = NumpyCollection(
+                    os.path.join(self.numpy_dir, name),
+                    name=name,
+                    dtype=self.numpy_dtype,
+                    compact_ratio=self.compact_ratio,
+                )
+            return self._numpy[name]
+
+    def _saved_pointers(self) -> dict[str, str]:
+        if not self.pointer_file:
+            return {}
+        try:
+            with open(self.pointer_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Reading saved vector pointers failed: {e}")
+            return {}
+
+    def _save_pointers(self, pointers: dict[str, str]) -> None:
+        """Salin pointer ke `pointer_file` (atomic replace; dibagi proses lain di host ini)."""
+        if not self.pointer_file:
+            return
+        try:
+            saved = self._saved_pointers()
+            if all(saved.get(k) == v for k, v in pointers.items()):
+                return
+            saved.update(pointers)
+            os.makedirs(os.path.dirname(self.pointer_file) or ".", exist_ok=True)
+            tmp = f"{self.pointer_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(saved, f)
+            os.replace(tmp, self.pointer_file)
+        except Exception as e:
+            logger.warning(f"Saving vector pointers failed: {e}")
+
+    def resolve(self, name: str = DEFAULT_COLLECTION, fresh: bool = False) -> str:
+        """
+        Nama collection fisik di balik nama logis `name`. Kalau Redis gagal:
+        pointer yang disimpan di `pointer_file`, lalu cache proses; kalau
+        keduanya tidak ada, `fresh=True` (penulisan) raise RuntimeError dan
+        pembacaan memakai nama logis.
+        """
+        cached = self._pointers.get(name)
+        if not fresh and cached and time.monotonic() - cached[1] < self.handle_ttl:
+            return cached[0]
+        try:
+            value = get_redis().get(f"{POINTER_PREFIX}{name}")
+        except Exception as e:
+            target = self._saved_pointers().get(name) or (cached[0] if cached else None)
+            if target is None:
+                if fresh:
+                    raise RuntimeError(f"Vector pointer for {name} unavailable: {e}") from e
+                target = name
+            logger.warning(f"Vector pointer lookup failed for {name}, using last known {target}: {e}")
+        else:
+            target = value.decode() if value else name
+            if not cached or cached[0] != target:
+                self._save_pointers({name: target})
+        self._pointers[name] = (target, time.monotonic())
+        return target
+
+    def model_of(self, physical: str) -> str:
+        """
+        Model embedding collection fisik `physical`. Pin tidak pernah berubah
+        selama collection ada, jadi di-cache permanen. Collection tanpa pin
+        (dibuat sebelum ada pinning) di-pin ke EMBEDDING_MODEL saat pertama
+        dilihat, supaya mengganti setting tidak diam-diam mengubah model live.
+        """
+        model = self._models.get(physical)
+        if model:
+            return model
+        default = get_settings().EMBEDDING_MODEL
+        key = f"{MODEL_PREFIX}{physical}"
+        try:
+            redis = get_redis()
+            redis.set(key, default, nx=True)
+            value = redis.get(key)
+        except Exception as e:
+            logger.warning(f"Vector model lookup failed for {physical}, assuming {default}: {e}")
+            return default
+        model = value.decode() if value else default
+        self._models[physical] = model
+        return model
+
+    def pin_model(self, physical: str, model: str) -> None:
+        """Tetapkan model embedding collection fisik baru (sebelum ada tulisan)."""
+        get_redis().set(f"{MODEL_PREFIX}{physical}", model)
+        self._models[physical] = model
+
+    def live_model(self, name: str = DEFAULT_COLLECTION, fresh: bool = False) -> str:
+        return self.model_of(self.resolve(name, fresh))
+
+    def collection(self, name: str = DEFAULT_COLLECTION, fresh: bool = False) -> chromadb.Collection:
+        name = self.resolve(name, fresh)
+        if self.mode == "numpy":
+            return self._numpy_collection(name)
+        col = self._fresh(name)
+        if col is None:
+            with self._lock:
+                col = self._fresh(name)
+                if col is None:
+                    col = self.client.get_or_create_collection(name)
+                    self._collections[name] = (col, time.monotonic())
+        return col
+
+    def forget_collection(self, name: str) -> None:
+        """Buang handle ter-cache (mis. setelah collection dihapus/di-rename)."""
+        with self._lock:
+            self._collections.pop(name, None)
+            self._numpy.pop(name, None)
+
+    def drop_collection(self, name: str) -> None:
+        """Hapus collection beserta datanya (mis. collection sementara benchmark)."""
+        self.forget_collection(name)
+        self._models.pop(name, None)
+        try:
+            get_redis().delete(f"{MODEL_PREFIX}{name}")
+        except Exception as e:
+            logger.warning(f"Dropping vector model pin for {name} failed: {e}")
+        if self.mode == "numpy":
+            path = os.path.join(self.numpy_dir, name)
+            shutil.rmtree(path, ignore_errors=True)
+            if os.path.exists(f"{path}.lock"):
+                os.remove(f"{path}.lock")
+            return
+        self.client.delete_collection(name)
+
+    def swap_collection(self, shadow: str, live: str = DEFAULT_COLLECTION) -> str:
+        """
+        Jadikan collection `shadow` sebagai `live` dengan mengganti pointer.
+        Collection fisik yang sebelumnya live tetap ada dan ditunjuk oleh
+        `{live}__prev` (backup sebelumnya dibuang), sehingga proses lain yang
+        masih memakai pointer lama tetap bisa query sampai cache-nya habis.
+        """
+        backup = f"{live}__prev"
+        redis = get_redis()
+        previous = self.resolve(live, fresh=True)
+        old_backup = redis.get(f"{POINTER_PREFIX}{backup}")
+
+        pipe = redis.pipeline(transaction=True)
+        pipe.set(f"{POINTER_PREFIX}{live}", shadow)
+        pipe.set(f"{POINTER_PREFIX}{backup}", previous)
+        pipe.execute()
+        with self._lock:
+            now = time.monotonic()
+            self._pointers[live] = (shadow, now)
+            self._pointers[backup] = (previous, now)
+        self._save_pointers({live: shadow, backup: previous})
+
+        if old_backup is not None and old_backup.decode() not in (shadow, previous):
+            try:
+                self.drop_collection(old_backup.decode())
+            except Exception as e:
+                logger.warning(f"Dropping old vector backup {old_backup.decode()} failed: {e}")
+        logger.info(f"Vector collection swapped: {live} -> {shadow} (old {previous} kept as {backup})")
+        return backup
+
+    def heartbeat(self) -> bool:
+        try:
+            if self.mode == "numpy":
+                os.makedirs(self.numpy_dir, exist_ok=True)
+                return True
+            self.client.heartbeat()
+            return True
+        except Exception as e:
+            logger.error(f"Vector store heartbeat failed: {e}")
+            return False
+
+
+@lru_cache
+def get_vector_store() -> VectorStore:
+    """Instance vector store tunggal per proses."""
+    settings = get_settings()
+    return VectorStore(
+        mode=settings.VECTOR_DB_MODE,
+        url=settings.VECTOR_DB_URL,
+        persist_dir=settings.CHROMA_PERSIST_DIR,
+        handle_ttl=settings.VECTOR_HANDLE_TTL,
+        numpy_dir=settings.NUMPY_INDEX_DIR,
+        numpy_dtype=settings.NUMPY_INDEX_DTYPE,
+        compact_ratio=settings.NUMPY_COMPACT_RATIO,
+        pointer_file=settings.VECTOR_POINTER_FILE,
+    )
+
+
+def get_collection(name: str = DEFAULT_COLLECTION, fresh: bool = False) -> chromadb.Collection:
+    return get_vector_store().collection(name, fresh)
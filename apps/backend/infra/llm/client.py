@@ -0,0 +1,271 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI
+
+from core.config import get_settings
+from core.logger import logger
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMProvider(ABC):
+    """
+    Abstraksi provider LLM async. Setiap provider memegang satu HTTP client
+    ber-pool (keep-alive) yang dipakai ulang oleh semua request di proses ini.
+    """
+
+    name = "base"
+
+    def __init__(self, timeout: float, connect_timeout: float, max_retries: int, max_connections: int, max_keepalive: int):
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+
+    def _http_client(self, **kwargs) -> httpx.AsyncClient:
+        # tanpa retry di transport: satu-satunya lapisan retry ada di _post_with_retries
+        return httpx.AsyncClient(timeout=self.timeout, limits=self.limits, **kwargs)
+
+    async def _post_with_retries(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        """POST dengan retry + exponential backoff untuk 429/5xx, timeout dan error koneksi."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(url, **kwargs)
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"{self.name} request failed ({e}), retrying")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        raise LLMError(f"{self.name}: retries exhausted")
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Jawaban lengkap untuk satu prompt."""
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Jawaban sebagai potongan teks (token/delta) berurutan."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class CustomProvider(LLMProvider):
+    """Provider internal dengan API OpenAI-compatible (Qwen-like)."""
+
+    name = "custom"
+
+    def __init__(self, url: str, token: str | None, model: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.model = model
+        self.client = self._http_client(headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        })
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "developer",
+                    "content": "You are an AI assistant that follows instructions extremely well."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "seed": 42,
+            "n": 1,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def generate(self, prompt: str) -> str:
+        try:
+            response = await self._post_with_retries(self.client, self.url, json=self._payload(prompt))
+            data = response.json()
+            # Format jawaban dari API Qwen-like: choices[0].message.content
+            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            raise LLMError(f"Custom LLM error: {e}")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        try:
+            async with self.client.stream("POST", self.url, json=self._payload(prompt, stream=True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except Exception as e:
+            raise LLMError(f"Custom LLM error: {e}")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class OllamaProvider(LLMProvider):
+    """Ollama lokal lewat REST API (/api/chat)."""
+
+    name = "ollama"
+
+    def __init__(self, host: str, model: str, **kwargs):
+        super().__init__(**kwargs)
+        self.model = model
+        self.client = self._http_client(base_url=host)
+
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+
+    async def generate(self, prompt: str) -> str:
+        response = await self._post_with_retries(self.client, "/api/chat", json=self._payload(prompt, stream=False))
+        return response.json()["message"]["content"]
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Ollama streaming = NDJSON, satu objek per baris
+        async with self.client.stream("POST", "/api/chat", json=self._payload(prompt, stream=True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str | None, model: str, **kwargs):
+        super().__init__(**kwargs)
+        self.model = model
+        self._http = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        # SDK sudah punya retry + backoff sendiri
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=self.max_retries,
+            timeout=self.timeout,
+            http_client=self._http,
+        )
+
+    def _messages(self, prompt: str) -> list[dict]:
+        return [
+            {"role": "system", "content": "Kamu adalah asisten AI yang menjawab berdasarkan konteks dokumen."},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt),
+        )
+        return response.choices[0].message.content.strip()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt),
+            stream=True,
+        )
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class StubProvider(LLMProvider):
+    """
+    LLM palsu untuk benchmark / development tanpa API key: jawaban tetap
+    setelah latency yang bisa diatur (waktu token pertama + per token).
+    """
+
+    name = "stub"
+
+    def __init__(self, first_token_ms: int, token_ms: int, tokens: int, **kwargs):
+        super().__init__(**kwargs)
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+
+    def _token(self, i: int) -> str:
+        return f"token{i} "
+
+    async def generate(self, prompt: str) -> str:
+        await asyncio.sleep((self.first_token_ms + self.token_ms * self.tokens) / 1000)
+        return "".join(self._token(i) for i in range(self.tokens)).strip()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield self._token(i)
+
+
+@lru_cache
+def get_llm_client() -> LLMProvider:
+    """Provider LLM tunggal per proses, dipilih lewat LLM_PROVIDER."""
+    settings = get_settings()
+    common = dict(
+        timeout=settings.LLM_TIMEOUT,
+        connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive=settings.LLM_MAX_KEEPALIVE,
+    )
+
+    if settings.LLM_PROVIDER == "custom":
+        return CustomProvider(
+            url=settings.CUSTOM_LLM_URL,
+            token=settings.CUSTOM_LLM_TOKEN,
+            model=settings.CUSTOM_LLM_MODEL,
+            **common,
+        )
+    if settings.LLM_PROVIDER == "ollama":
+        return OllamaProvider(host=settings.OLLAMA_HOST, model=settings.OLLAMA_MODEL, **common)
+    if settings.LLM_PROVIDER == "stub":
+        return StubProvider(
+            first_token_ms=settings.STUB_LLM_FIRST_TOKEN_MS,
+            token_ms=settings.STUB_LLM_TOKEN_MS,
+            tokens=settings.STUB_LLM_TOKENS,
+            **common,
+        )
+    return OpenAIProvider(api_key=settings.OPENAI_API_KEY, model=settings.OPENAI_MODEL, **common)
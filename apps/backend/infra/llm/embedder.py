@@ -0,0 +1,266 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from core.config import get_settings
+from core.logger import logger
+from infra.db.redis import get_redis
+from infra.db.vector_store import get_vector_store
+from infra.llm.embedding_cache import QueryEmbeddingCache
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# sampel bawaan untuk cek kesesuaian backend terkuantisasi vs fp32
+AGREEMENT_SAMPLE = [
+    "Bagaimana cara mengajukan cuti tahunan?",
+    "Kebijakan pengembalian dana berlaku 30 hari setelah pembelian.",
+    "Error code E-4012: koneksi ke server database terputus.",
+    "SKU BRG-00931 tersedia di gudang Surabaya dan Jakarta.",
+    "Laporan keuangan kuartal ketiga menunjukkan kenaikan pendapatan 12%.",
+    "Prosedur onboarding karyawan baru mencakup pelatihan keamanan.",
+    "The invoice must be approved by the finance manager before payment.",
+    "Reset your password from the account settings page.",
+    "Pak Budi Santoso menjabat sebagai kepala divisi operasional.",
+    "Suhu penyimpanan produk harus dijaga antara 2 dan 8 derajat Celsius.",
+    "Kontrak kerja sama berlaku selama dua tahun dan dapat diperpanjang.",
+    "Timeout after 30 seconds while waiting for the upstream service.",
+    "Jadwal pemeliharaan sistem setiap Minggu pukul 01.00 WIB.",
+    "Dokumen ini menjelaskan arsitektur layanan pencarian internal.",
+    "Customer data is encrypted at rest using AES-256.",
+    "Pengiriman ke luar pulau memerlukan waktu 5-7 hari kerja.",
+]
+
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+class EmbeddingService:
+    """
+    Satu model embedding per proses, dimuat sekali saat startup dan dipakai
+    bersama oleh semua route. `encode` dijalankan di thread pool khusus agar
+    endpoint async tidak memblokir event loop.
+
+    Backend:
+    - "torch"     : PyTorch fp32 (default)
+    - "onnx"      : ONNX Runtime fp32
+    - "onnx-int8" : ONNX Runtime dengan dynamic quantization int8
+      (`quant_config` = avx2 / avx512 / avx512_vnni / arm64)
+
+    Untuk backend selain torch, hasilnya dibandingkan dengan model fp32 pada
+    sampel saat load. Jika rata-rata cosine < `min_agreement`, service
+    kembali ke torch supaya kualitas retrieval tidak turun diam-diam.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        max_workers: int = 2,
+        query_cache: QueryEmbeddingCache | None = None,
+        backend: str = "torch",
+        quant_config: str = "avx2",
+        onnx_dir: str = "/data/models",
+        min_agreement: float | None = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"EMBEDDING_BACKEND tidak dikenal: {backend}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.backend = backend
+        self.quant_config = quant_config
+        self.onnx_dir = onnx_dir
+        self.min_agreement = min_agreement
+        self.agreement: dict | None = None
+        self.query_cache = query_cache
+        self._model: SentenceTransformer | None = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="embedder",
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> SentenceTransformer:
+        # double-checked locking: beberapa thread bisa memanggil load() bersamaan
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"Loading embedding model: {self.model_name} ({self.backend})")
+                    model = self._load_backend()
+                    if self.backend != "torch" and self.min_agreement is not None:
+                        model = self._verify(model)
+                    self._model = model
+        return self._model
+
+    def _load_backend(self) -> SentenceTransformer:
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name)
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, backend="onnx")
+
+        file_name = f"onnx/model_qint8_{self.quant_config}.onnx"
+        try:
+            # beberapa model di hub sudah menyediakan varian int8
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs={"file_name": file_name})
+        except Exception:
+            return self._export_int8(file_name)
+
+    def _export_int8(self, file_name: str) -> SentenceTransformer:
+        """Kuantisasi model ONNX secara lokal (sekali, disimpan di `onnx_dir`)."""
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        local_dir = os.path.join(self.onnx_dir, self.model_name.replace("/", "__"))
+        if not os.path.exists(os.path.join(local_dir, file_name)):
+            logger.info(f"Exporting int8 ONNX model ({self.quant_config}) to {local_dir}")
+            model = SentenceTransformer(self.model_name, backend="onnx")
+            model.save(local_dir)
+            export_dynamic_quantized_onnx_model(model, self.quant_config, local_dir)
+        return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+    def compare_with_reference(self, model: SentenceTransformer, texts: list[str]) -> dict:
+        """Cosine per teks antara `model` dan model fp32 (torch) untuk teks yang sama."""
+        reference = SentenceTransformer(self.model_name)
+        ref = reference.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        got = model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        cos = _cosine_rows(ref.astype(np.float32), got.astype(np.float32))
+        return {
+            "backend": self.backend,
+            "samples": len(texts),
+            "mean_cosine": round(float(cos.mean()), 5),
+            "min_cosine": round(float(cos.min()), 5),
+            "p5_cosine": round(float(np.percentile(cos, 5)), 5),
+        }
+
+    def _verify(self, model: SentenceTransformer) -> SentenceTransformer:
+        report = self.compare_with_reference(model, AGREEMENT_SAMPLE)
+        report["threshold"] = self.min_agreement
+        report["accepted"] = report["mean_cosine"] >= self.min_agreement
+        self.agreement = report
+        if report["accepted"]:
+            logger.info(f"Embedding backend agreement OK: {report}")
+            return model
+
+        logger.error(f"Embedding backend {self.backend} below agreement threshold, falling back to torch: {report}")
+        self.backend = "torch"
+        return SentenceTransformer(self.model_name)
+
+    def embed_batch(self, texts: list[str]) -> np.ndarray:
+        """Matriks float32 (n x dim); tidak dikonversi ke list Python."""
+        model = self.load()
+        if not texts:
+            return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+        ).astype(np.float32, copy=False)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        if self.query_cache is None:
+            return self.embed_batch([text])[0]
+
+        emb = self.query_cache.get(text)
+        if emb is None:
+            emb = self.embed_batch([text])[0]
+            self.query_cache.set(text, emb)
+        return emb
+
+    def embed_queries(self, texts: list[str]) -> np.ndarray:
+        """Banyak query sekaligus: cek cache per query, sisanya satu panggilan encode."""
+        if self.query_cache is None:
+            return self.embed_batch(texts)
+
+        embs = [self.query_cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embs) if e is None))
+        if missing:
+            fresh = dict(zip(missing, self.embed_batch(missing)))
+            for text, emb in fresh.items():
+                self.query_cache.set(text, emb)
+            embs = [e if e is not None else fresh[t] for t, e in zip(texts, embs)]
+        return np.vstack(embs)
+
+    async def aembed_batch(self, texts: list[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_batch, texts)
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_query, text)
+
+    async def aload(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.load)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_embedder(model_name: str = None) -> EmbeddingService:
+    """
+    Instance embedder per model per proses (default EMBEDDING_MODEL). Model
+    lain dipakai reindex (REINDEX_EMBEDDING_MODEL) dan mirror write ke shadow.
+    """
+    return _embedder(model_name or get_settings().EMBEDDING_MODEL)
+
+
+@lru_cache
+def _embedder(model_name: str) -> EmbeddingService:
+    settings = get_settings()
+
+    query_cache = None
+    if settings.QUERY_CACHE_ENABLED:
+        query_cache = QueryEmbeddingCache(
+            # backend ikut di key: vector int8 sedikit berbeda dari fp32
+            model_name=f"{model_name}:{settings.EMBEDDING_BACKEND}",
+            max_size=settings.QUERY_CACHE_SIZE,
+            ttl=settings.QUERY_CACHE_TTL,
+            redis_client=get_redis() if settings.QUERY_CACHE_REDIS else None,
+        )
+
+    return EmbeddingService(
+        model_name=model_name,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        max_workers=settings.EMBEDDING_WORKERS,
+        query_cache=query_cache,
+        backend=settings.EMBEDDING_BACKEND,
+        quant_config=settings.EMBEDDING_QUANT_CONFIG,
+        onnx_dir=settings.EMBEDDING_ONNX_DIR,
+        min_agreement=settings.EMBEDDING_MIN_AGREEMENT if settings.EMBEDDING_AGREEMENT_CHECK else None,
+    )
+
+
+def live_embedder() -> EmbeddingService:
+    """Embedder untuk model yang di-pin ke collection live (berganti saat swap)."""
+    return get_embedder(get_vector_store().live_model())
+
+
+# --- API sederhana untuk route (model collection live)
+def embed_query(text: str) -> np.ndarray:
+    return live_embedder().embed_query(text)
+
+
+def embed_batch(texts: list[str]) -> np.ndarray:
+    return live_embedder().embed_batch(texts)
+
+
+def embed_queries(texts: list[str]) -> np.ndarray:
+    return live_embedder().embed_queries(texts)
+
+
+async def aembed_query(text: str) -> np.ndarray:
+    return await live_embedder().aembed_query(text)
+
+
+async def aembed_batch(texts: list[str]) -> np.ndarray:
+    return await live_embedder().aembed_batch(texts)
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from core.logger import logger
+
+
+def normalize_query(text: str) -> str:
+    """
+    Rapikan spasi supaya variasi penulisan kecil tetap hit. Huruf besar/kecil
+    tidak disamakan: model cased memberi embedding/skor berbeda untuk "US"
+    dan "us", jadi hasilnya tidak boleh dipakai bergantian.
+    """
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Cache embedding query dua tingkat:
+
+    1. LRU in-process (dibatasi `max_size`), paling cepat
+    2. Redis dengan TTL, dibagi antar worker
+
+    Key = model + hash teks query yang sudah dinormalisasi. Kalau Redis
+    tidak tersedia, cache tetap jalan dengan LRU saja.
+    """
+
+    def __init__(self, model_name: str, max_size: int = 2048, ttl: int = 86400, redis_client=None):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis = redis_client
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(normalize_query(text).encode("utf-8")).hexdigest()
+        # v2: key versi lama dihitung dari teks lowercase -> jangan dipakai lagi
+        return f"qemb:v2:{self.model_name}:{digest}"
+
+    def _remember(self, key: str, emb: np.ndarray) -> None:
+        with self._lock:
+            self._lru[key] = emb
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = self.key(text)
+
+        with self._lock:
+            emb = self._lru.get(key)
+            if emb is not None:
+                self._lru.move_to_end(key)
+                self.local_hits += 1
+                return emb
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"Query cache redis get failed: {e}")
+                raw = None
+            if raw is not None:
+                emb = np.frombuffer(raw, dtype=np.float32)
+                self._remember(key, emb)
+                with self._lock:
+                    self.redis_hits += 1
+                return emb
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text: str, emb: np.ndarray) -> None:
+        key = self.key(text)
+        emb = np.asarray(emb, dtype=np.float32)
+        self._remember(key, emb)
+
+        if self.redis is not None:
+            try:
+                self.redis.set(key, emb.tobytes(), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Query cache redis set failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            total = hits + self.misses
+            return {
+                "model": self.model_name,
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from sentence_transformers import CrossEncoder
+
+from core.config import get_settings
+from core.logger import logger
+from infra.db.redis import get_redis
+from infra.llm.embedding_cache import normalize_query
+
+
+class RerankService:
+    """
+    Cross-encoder untuk rerank kandidat retrieval.
+
+    - semua pasangan (query, chunk) di-score dalam satu panggilan `predict`,
+      termasuk lintas query di `rerank_batch`
+    - skor di-cache per (query, hash chunk): LRU in-process + Redis
+    - `rerank` punya budget waktu; kalau terlewati, urutan awal dipakai.
+      Job yang baru mulai setelah deadline-nya lewat dilewati, dan antrean
+      dibatasi `max_pending` (lebih dari itu langsung fallback), sehingga
+      job basi tidak menumpuk di depan request baru saat CPU sibuk
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        budget_ms: int = 300,
+        cache_size: int = 4096,
+        cache_ttl: int = 86400,
+        max_pending: int = 4,
+        redis_client=None,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_pending = max_pending
+        self.redis = redis_client
+        self._model: CrossEncoder | None = None
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, float] = OrderedDict()
+        # satu worker: predict berurutan, tidak berebut CPU dengan embedder
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._pending = 0  # job di antrean + yang sedang jalan
+        self.cache_hits = 0
+        self.scored = 0
+        self.timeouts = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def load(self) -> CrossEncoder:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"Loading rerank model: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def _key(self, query: str, text: str) -> str:
+        q = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        t = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        return f"rerank:v2:{self.model_name}:{q}:{t}"
+
+    def _remember(self, items: dict[str, float]) -> None:
+        with self._lock:
+            for key, score in items.items():
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, keys: list[str]) -> dict[str, float]:
+        with self._lock:
+            found = {k: self._cache[k] for k in keys if k in self._cache}
+
+        missing = [k for k in keys if k not in found]
+        if missing and self.redis is not None:
+            try:
+                values = self.redis.mget(missing)
+            except Exception as e:
+                logger.warning(f"Rerank cache redis get failed: {e}")
+                values = []
+            remote = {k: float(v) for k, v in zip(missing, values) if v is not None}
+            self._remember(remote)
+            found.update(remote)
+        return found
+
+    def _store(self, items: dict[str, float]) -> None:
+        self._remember(items)
+        if self.redis is not None and items:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, score in items.items():
+                    pipe.set(key, score, ex=self.cache_ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Rerank cache redis set failed: {e}")
+
+    def score_batch(self, groups: list[tuple[str, list[str]]]) -> list[list[float]]:
+        """
+        Skor relevansi untuk banyak (query, teks): cache dulu, semua pasangan
+        yang belum ter-cache (lintas query) di-score dalam satu `predict`.
+        """
+        keys = [[self._key(q, t) for t in texts] for q, texts in groups]
+        flat = [k for ks in keys for k in ks]
+        scores = self._cached(flat)
+
+        todo: dict[str, tuple[str, str]] = {}
+        for (q, texts), ks in zip(groups, keys):
+            for k, t in zip(ks, texts):
+                if k not in scores:
+                    todo.setdefault(k, (q, t))
+        if todo:
+            predicted = self.load().predict(
+                list(todo.values()),
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            fresh = {k: float(s) for k, s in zip(todo, predicted)}
+            self._store(fresh)
+            scores.update(fresh)
+
+        with self._lock:
+            self.cache_hits += len(flat) - len(todo)
+            self.scored += len(todo)
+        return [[scores[k] for k in ks] for ks in keys]
+
+    def score(self, query: str, texts: list[str]) -> list[float]:
+        """Skor relevansi tiap teks terhadap query (cache dulu, sisanya satu batch)."""
+        return self.score_batch([(query, texts)])[0]
+
+    def _job(self, groups: list[tuple[str, list[str]]], deadline: float) -> list[list[float]] | None:
+        try:
+            if time.monotonic() >= deadline:
+                # request-nya sudah fallback; jangan habiskan CPU untuk job basi
+                with self._lock:
+                    self.expired += 1
+                return None
+            return self.score_batch(groups)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def rerank_batch(self, queries: list[str], hits_list: list[list[dict]], top_k: int) -> list[list[dict]]:
+        """
+        `rerank` untuk banyak query sekaligus: satu job (satu `predict`) di
+        bawah satu deadline untuk seluruh batch; kalau budget terlewati,
+        semua query memakai urutan awal.
+        """
+        fallback = [hits[:top_k] for hits in hits_list]
+        todo = [i for i, hits in enumerate(hits_list) if len(hits) > 1]
+        if not todo:
+            return fallback
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return fallback
+            self._pending += 1
+
+        budget = self.budget_ms / 1000
+        groups = [(queries[i], [h["text"] for h in hits_list[i]]) for i in todo]
+        future = self._executor.submit(self._job, groups, time.monotonic() + budget)
+        try:
+            scores = future.result(timeout=budget)
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"Rerank over budget ({self.budget_ms} ms), using retrieval order")
+            return fallback
+        except Exception as e:
+            logger.error(f"Rerank failed, using retrieval order: {e}")
+            return fallback
+        if scores is None:
+            return fallback
+
+        results = list(fallback)
+        for i, group_scores in zip(todo, scores):
+            ranked = sorted(zip(hits_list[i], group_scores), key=lambda p: p[1], reverse=True)
+            results[i] = [{**hit, "rerank_score": score} for hit, score in ranked[:top_k]]
+        return results
+
+    def rerank(self, query: str, hits: list[dict], top_k: int) -> list[dict]:
+        """Urutkan ulang `hits` ({"text", ...}) dalam budget; fallback urutan awal."""
+        return self.rerank_batch([query], [hits], top_k)[0]
+
+    async def aload(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.load)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.cache_hits + self.scored
+            return {
+                "model": self.model_name,
+                "budget_ms": self.budget_ms,
+                "cache_size": len(self._cache),
+                "cache_hits": self.cache_hits,
+                "scored": self.scored,
+                "timeouts": self.timeouts,
+                "expired": self.expired,
+                "rejected": self.rejected,
+                "pending": self._pending,
+                "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+            }
+
+
+@lru_cache
+def get_reranker() -> RerankService:
+    """Instance reranker tunggal per proses (hanya dipakai jika RERANK_ENABLED)."""
+    settings = get_settings()
+    return RerankService(
+        model_name=settings.RERANK_MODEL,
+        batch_size=settings.RERANK_BATCH_SIZE,
+        budget_ms=settings.RERANK_BUDGET_MS,
+        cache_size=settings.RERANK_CACHE_SIZE,
+        cache_ttl=settings.RERANK_CACHE_TTL,
+        max_pending=settings.RERANK_MAX_PENDING,
+        redis_client=get_redis(),
+    )
@@ -13,7 +13,7 @@ from core.config import get_settings
 from infra.db.base import Base
 
 # --- IMPORT ALL MODELS (tidak boleh ada import model dalam base.py)
-from domain.documents.models import Document
+from domain.documents.models import Document, DocumentPage, DocumentChunk
 from domain.chat.models import ChatSession, ChatMessage  # <-- penting: import di sini, bukan di base.py
 
 # --- Alembic config
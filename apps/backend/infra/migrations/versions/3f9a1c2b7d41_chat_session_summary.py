@@ -0,0 +1,24 @@
+"""chat session rolling summary
+
+Revision ID: 3f9a1c2b7d41
+Revises: 66d584e7d0ad
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2b7d41'
+down_revision = '66d584e7d0ad'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary_until', sa.DateTime(timezone=True), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'summary_until')
+    op.drop_column('chat_sessions', 'summary')
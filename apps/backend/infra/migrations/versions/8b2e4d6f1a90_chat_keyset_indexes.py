@@ -0,0 +1,39 @@
+"""chat keyset pagination indexes
+
+Revision ID: 8b2e4d6f1a90
+Revises: 3f9a1c2b7d41
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a90'
+down_revision = '3f9a1c2b7d41'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY tidak boleh di dalam transaksi dan tidak
+    # mengunci tabel chat dari write selama index dibangun
+    with op.get_context().autocommit_block():
+        # history per session + keyset (created_at, id); juga melayani filter session_id saja
+        op.create_index(
+            'ix_chat_messages_session_created_id',
+            'chat_messages',
+            ['session_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        # listing session terbaru (keyset: updated_at, id)
+        op.create_index(
+            'ix_chat_sessions_updated_at_id',
+            'chat_sessions',
+            ['updated_at', 'id'],
+            postgresql_concurrently=True,
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_chat_sessions_updated_at_id', table_name='chat_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_chat_messages_session_created_id', table_name='chat_messages', postgresql_concurrently=True)
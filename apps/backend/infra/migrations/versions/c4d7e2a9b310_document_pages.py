@@ -0,0 +1,98 @@
+"""move extracted text to compressed document_pages
+
+Revision ID: c4d7e2a9b310
+Revises: 8b2e4d6f1a90
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e2a9b310'
+down_revision = '8b2e4d6f1a90'
+branch_labels = None
+depends_on = None
+
+documents = sa.table(
+    'documents',
+    sa.column('id', postgresql.UUID(as_uuid=True)),
+    sa.column('extracted_text', sa.Text()),
+    sa.column('page_count', sa.Integer()),
+    sa.column('text_chars', sa.Integer()),
+)
+document_pages = sa.table(
+    'document_pages',
+    sa.column('document_id', postgresql.UUID(as_uuid=True)),
+    sa.column('page', sa.Integer()),
+    sa.column('char_count', sa.Integer()),
+    sa.column('content', sa.LargeBinary()),
+)
+
+BATCH = 200  # dokumen per batch -> teks tidak dimuat sekaligus
+
+def _doc_batches(conn, stmt):
+    """Keyset pagination by documents.id: WHERE id > :last ORDER BY id LIMIT BATCH."""
+    last = None
+    while True:
+        q = stmt.order_by(documents.c.id).limit(BATCH)
+        if last is not None:
+            q = q.where(documents.c.id > last)
+        rows = conn.execute(q).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+def upgrade() -> None:
+    op.create_table('document_pages',
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('page', sa.Integer(), nullable=False),
+    sa.Column('char_count', sa.Integer(), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('document_id', 'page')
+    )
+    op.add_column('documents', sa.Column('page_count', sa.Integer(), nullable=True))
+    op.add_column('documents', sa.Column('text_chars', sa.Integer(), nullable=True))
+
+    # teks lama tidak punya batas halaman -> disimpan sebagai satu page (1)
+    conn = op.get_bind()
+    cctx = zstandard.ZstdCompressor(level=6)
+    stmt = sa.select(documents.c.id, documents.c.extracted_text).where(documents.c.extracted_text.isnot(None))
+    for rows in _doc_batches(conn, stmt):
+        conn.execute(document_pages.insert(), [
+            {'document_id': doc_id, 'page': 1, 'char_count': len(text), 'content': cctx.compress(text.encode('utf-8'))}
+            for doc_id, text in rows
+        ])
+        for doc_id, text in rows:
+            conn.execute(
+                documents.update().where(documents.c.id == doc_id).values(page_count=1, text_chars=len(text))
+            )
+
+    op.drop_column('documents', 'extracted_text')
+
+def downgrade() -> None:
+    op.add_column('documents', sa.Column('extracted_text', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    dctx = zstandard.ZstdDecompressor()
+    for docs in _doc_batches(conn, sa.select(documents.c.id)):
+        ids = [row[0] for row in docs]
+        texts: dict = {}
+        rows = conn.execute(
+            sa.select(document_pages.c.document_id, document_pages.c.content)
+            .where(document_pages.c.document_id.in_(ids))
+            .order_by(document_pages.c.document_id, document_pages.c.page)
+        )
+        for doc_id, content in rows:
+            texts.setdefault(doc_id, []).append(dctx.decompress(content).decode('utf-8'))
+        for doc_id, pages in texts.items():
+            conn.execute(documents.update().where(documents.c.id == doc_id).values(extracted_text="\n".join(pages)))
+
+    op.drop_column('documents', 'text_chars')
+    op.drop_column('documents', 'page_count')
+    op.drop_table('document_pages')
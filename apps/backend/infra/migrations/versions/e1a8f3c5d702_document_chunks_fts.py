@@ -0,0 +1,39 @@
+"""lexical chunk index (postgres full-text)
+
+Revision ID: e1a8f3c5d702
+Revises: c4d7e2a9b310
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a8f3c5d702'
+down_revision = 'c4d7e2a9b310'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('document_chunks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('page', sa.Integer(), nullable=True),
+    sa.Column('char_start', sa.Integer(), nullable=True),
+    sa.Column('char_end', sa.Integer(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('simple', content)", persisted=True), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_document_chunks_tsv', 'document_chunks', ['tsv'], postgresql_using='gin')
+    op.create_index('ix_document_chunks_document_id', 'document_chunks', ['document_id'])
+    # chunk dokumen lama terisi saat dokumen di-embed/reindex berikutnya
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_document_id', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_tsv', table_name='document_chunks')
+    op.drop_table('document_chunks')
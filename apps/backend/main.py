@@ -1,13 +1,40 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import get_settings
 from core.logger import logger
 from core.exceptions import register_exception_handlers
+from core.metrics import StageTimingMiddleware, metrics_payload
+from infra.llm.embedder import live_embedder
+from infra.db.vector_store import get_vector_store
+from infra.llm.client import get_llm_client
+from infra.llm.reranker import get_reranker
 from domain.chat.routes import router as chat_router
 from domain.documents.routes import router as docs_router
 
 settings = get_settings()
-app = FastAPI(title=settings.APP_NAME)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- Startup: muat model embedding sekali (warm load)
+    embedder = live_embedder()
+    await embedder.aload()
+    logger.info("Embedding model ready")
+    # buka client + collection vector store sekali per proses
+    get_vector_store().collection()
+    if settings.RERANK_ENABLED:
+        await get_reranker().aload()
+        logger.info("Rerank model ready")
+    yield
+    # --- Shutdown
+    embedder.shutdown()
+    if settings.RERANK_ENABLED:
+        get_reranker().shutdown()
+    await get_llm_client().aclose()
+
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 # --- CORS setup
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",")]
@@ -17,7 +44,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before", "Server-Timing"],
 )
+# timing per stage: Server-Timing, /metrics, slow-request log
+app.add_middleware(StageTimingMiddleware, slow_ms=settings.SLOW_REQUEST_MS)
 
 # --- Register global error handler
 register_exception_handlers(app)
@@ -31,3 +61,19 @@ app.include_router(docs_router)
 def health_check():
     logger.info("Health check pinged")
     return {"status": "ok", "app": settings.APP_NAME, "env": settings.APP_ENV}
+
+# --- Prometheus (histogram stage + request)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+# --- Statistik cache (untuk sizing)
+@app.get("/cache/stats")
+def cache_stats():
+    query_cache = live_embedder().query_cache
+    return {
+        "query_embedding": query_cache.stats() if query_cache else None,
+        "embedding_backend": {"backend": live_embedder().backend, "agreement": live_embedder().agreement},
+        "rerank": get_reranker().stats() if settings.RERANK_ENABLED else None,
+    }
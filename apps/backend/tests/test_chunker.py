@@ -0,0 +1,51 @@
+import random
+
+from domain.documents.chunker import iter_chunks
+
+
+def _pages(n: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    vocab = [f"w{i}" for i in range(3000)]
+    pages = []
+    for p in range(n):
+        lines = [" ".join(rnd.choice(vocab) for _ in range(rnd.randint(6, 18))) for _ in range(40)]
+        pages.append({"page": p + 1, "text": "\n".join(lines)})
+    return pages
+
+
+def _texts(pages: list[dict]) -> list[str]:
+    return [c["text"] for c in iter_chunks(pages, chunk_size=800, overlap=100, unit="word")]
+
+
+def test_chunks_respect_size_and_keep_positions():
+    pages = _pages(5)
+    chunks = list(iter_chunks(pages, chunk_size=800, overlap=100, unit="word"))
+
+    assert all(len(c["text"].split()) <= 800 for c in chunks)
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    first = chunks[0]
+    assert pages[0]["text"][first["char_start"]:].startswith(first["text"].split()[0])
+
+
+def test_insert_only_changes_nearby_chunks():
+    pages = _pages(20)
+    before = _texts(pages)
+
+    words = pages[1]["text"].split(" ")
+    words.insert(50, "sisipan")
+    edited = pages[:1] + [{"page": 2, "text": " ".join(words)}] + pages[2:]
+    after = _texts(edited)
+
+    assert len(set(before) & set(after)) >= len(before) - 2
+
+
+def test_delete_only_changes_nearby_chunks():
+    pages = _pages(20)
+    before = _texts(pages)
+
+    words = pages[9]["text"].split(" ")
+    del words[100:130]
+    edited = pages[:9] + [{"page": 10, "text": " ".join(words)}] + pages[10:]
+    after = _texts(edited)
+
+    assert len(set(before) & set(after)) >= len(before) - 2
@@ -0,0 +1,154 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from infra.db.numpy_index import RECORDS_FILE, NumpyCollection
+
+DIM = 16
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _fill(col: NumpyCollection, n: int, docs: int = 4, seed: int = 0) -> np.ndarray:
+    vecs = _vectors(n, seed)
+    col.upsert(
+        ids=[f"id{i}" for i in range(n)],
+        embeddings=vecs,
+        documents=[f"doc{i}" for i in range(n)],
+        metadatas=[{"document_id": f"d{i % docs}", "chunk_index": i} for i in range(n)],
+    )
+    return vecs
+
+
+@pytest.fixture(params=["float16", "int8"])
+def col(request, tmp_path):
+    return NumpyCollection(str(tmp_path / "documents"), dtype=request.param, compact_min=10)
+
+
+def test_upsert_and_query_returns_nearest_row(col):
+    vecs = _fill(col, 100)
+
+    out = col.query(query_embeddings=vecs[[7, 42]], n_results=3)
+
+    assert [ids[0] for ids in out["ids"]] == ["id7", "id42"]
+    assert out["documents"][0][0] == "doc7"
+    assert out["metadatas"][1][0] == {"document_id": "d2", "chunk_index": 42}
+    assert out["distances"][0][0] == pytest.approx(0.0, abs=0.02)
+    assert col.count() == 100
+
+
+def test_upsert_existing_id_replaces_row(col):
+    vecs = _fill(col, 20)
+
+    col.upsert(ids=["id3"], embeddings=vecs[[3]], documents=["baru"], metadatas=[{"document_id": "d3"}])
+
+    assert col.count() == 20
+    assert col.get(ids=["id3"])["documents"] == ["baru"]
+
+
+def test_delete_by_ids_and_document_id(col):
+    vecs = _fill(col, 40, docs=4)
+
+    col.delete(ids=["id0", "id1"])
+    col.delete(where={"document_id": "d2"})
+
+    assert col.count() == 40 - 2 - 10
+    assert col.get(where={"document_id": "d2"})["ids"] == []
+    assert len(col.get(where={"document_id": {"$in": ["d0", "d1"]}})["ids"]) == 18
+    out = col.query(query_embeddings=vecs[[2]], n_results=40)
+    assert "id2" not in out["ids"][0] and "id0" not in out["ids"][0]
+
+
+def test_update_changes_metadata_and_document_index(col):
+    _fill(col, 8, docs=2)
+
+    col.update(ids=["id0"], metadatas=[{"document_id": "d9", "chunk_index": 0}])
+
+    assert col.get(ids=["id0"])["metadatas"] == [{"document_id": "d9", "chunk_index": 0}]
+    assert col.get(where={"document_id": "d9"})["ids"] == ["id0"]
+    assert "id0" not in col.get(where={"document_id": "d0"})["ids"]
+
+
+def test_compaction_renumbers_rows_and_keeps_results(col):
+    vecs = _fill(col, 100, docs=10)
+
+    col.delete(where={"document_id": {"$in": ["d0", "d1", "d2"]}})  # > 20% -> compaction
+
+    assert len(col._ids) == 70
+    assert col.count() == 70
+    out = col.query(query_embeddings=vecs[[59]], n_results=1)
+    assert out["ids"] == [["id59"]] and out["documents"] == [["doc59"]]
+
+
+def test_superseded_records_trigger_compaction(col):
+    _fill(col, 50)
+    records = os.path.join(col.path, RECORDS_FILE)
+    initial = os.path.getsize(records)
+
+    for _ in range(5):
+        col.update(ids=[f"id{i}" for i in range(50)], metadatas=[{"document_id": "d1", "chunk_index": i} for i in range(50)])
+
+    # tanpa compaction records.bin berisi 6 versi tiap record
+    assert col._stale == 0
+    assert os.path.getsize(records) < 2 * initial
+    assert col.get(ids=["id3"])["metadatas"] == [{"document_id": "d1", "chunk_index": 3}]
+
+
+def test_second_instance_sees_writes(tmp_path):
+    path = str(tmp_path / "documents")
+    writer = NumpyCollection(path, compact_min=10)
+    reader = NumpyCollection(path, compact_min=10)
+    vecs = _fill(writer, 30)
+
+    assert reader.query(query_embeddings=vecs[[5]], n_results=1)["ids"] == [["id5"]]
+
+    writer.delete(where={"document_id": {"$in": ["d0", "d1"]}})  # compaction di "proses" lain
+    assert reader.count() == writer.count()
+    assert reader.query(query_embeddings=vecs[[7]], n_results=1)["documents"] == [["doc7"]]
+
+
+def test_query_consistent_when_compaction_runs_mid_query(tmp_path):
+    path = str(tmp_path / "documents")
+    reader = NumpyCollection(path, compact_min=10)
+    writer = NumpyCollection(path, compact_min=10)
+    vecs = _fill(writer, 100, docs=10)
+    scores = reader._scores
+
+    def compact_then_score(snap, q):
+        # compaction dari instance lain setelah snapshot diambil: row di-renumber
+        writer.delete(where={"document_id": {"$in": ["d0", "d1", "d2"]}})
+        assert len(writer._ids) == 70
+        return scores(snap, q)
+
+    reader._scores = compact_then_score
+    out = reader.query(query_embeddings=vecs[[59]], n_results=1)
+
+    assert out["ids"] == [["id59"]]
+    assert out["documents"] == [["doc59"]]
+    assert out["metadatas"] == [[{"document_id": "d9", "chunk_index": 59}]]
+
+
+def test_count_and_storage_wait_for_other_writer(tmp_path):
+    path = str(tmp_path / "documents")
+    writer = NumpyCollection(path, compact_min=10)
+    reader = NumpyCollection(path, compact_min=10)
+    _fill(writer, 20)
+    out = {}
+
+    def read():
+        out["count"] = reader.count()
+        out["rows"] = reader.storage()["rows"]
+
+    with writer._writing():
+        t = threading.Thread(target=read)
+        t.start()
+        t.join(0.2)
+        # flock exclusive writer (mis. compaction) belum dilepas -> reader menunggu
+        assert t.is_alive()
+    t.join(5)
+
+    assert out == {"count": 20, "rows": 20}
@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+# Jalankan reindex penuh (shadow collection + swap). RESUME=true untuk melanjutkan run terakhir.
+set -euo pipefail
+
+API_URL="${API_URL:-http://localhost:8000}"
+RESUME="${RESUME:-false}"
+
+curl -fsS -X POST "${API_URL}/docs/reindex?resume=${RESUME}"
+echo
+echo "Pantau progress: curl ${API_URL}/docs/reindex/status"
@@ -0,0 +1,170 @@
+"""
+Worker ingestion dokumen (extract -> chunk -> embed -> index).
+
+Mengambil job dari queue Redis yang diisi oleh POST /docs/process.
+Setiap worker adalah proses terpisah dengan model embedding sendiri
+(dimuat sekali saat worker start).
+
+Job dipindah (BLMOVE) dari queue ke list processing milik worker dan baru
+dihapus setelah selesai. Worker menulis heartbeat ke Redis; list processing
+milik worker yang heartbeat-nya habis (crash / redeploy) dikembalikan ke
+queue oleh worker lain. Ingestion idempotent, jadi job yang diulang aman.
+
+Vector store harus bisa dipakai bersama API dari proses lain:
+VECTOR_DB_MODE=http (server Chroma) atau numpy, bukan local (embedded).
+
+    python packages/embeddings/runner.py --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+
+# --- PATH FIX: pastikan runner tahu lokasi backend
+BASE_DIR = os.environ.get(
+    "BACKEND_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/backend")),
+)
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core.config import get_settings  # noqa: E402
+from core.logger import logger  # noqa: E402
+
+
+def processing_key(queue: str, worker_key: str) -> str:
+    return f"{queue}:processing:{worker_key}"
+
+
+def heartbeat_key(queue: str, worker_key: str) -> str:
+    return f"{queue}:alive:{worker_key}"
+
+
+def requeue_stale(redis, queue: str) -> int:
+    """Kembalikan job dari list processing milik worker yang sudah mati ke queue."""
+    moved = 0
+    prefix = processing_key(queue, "")
+    for key in redis.scan_iter(match=f"{prefix}*"):
+        worker_key = key.decode()[len(prefix):]
+        if redis.exists(heartbeat_key(queue, worker_key)):
+            continue
+        # RIGHT -> RIGHT: job yang tertunda diambil lebih dulu (consumer mengambil dari kanan)
+        while redis.lmove(key, queue, "RIGHT", "RIGHT") is not None:
+            moved += 1
+    if moved:
+        logger.warning(f"Requeued {moved} stale ingest job(s)")
+    return moved
+
+
+def _heartbeat(redis, key: str, ttl: int, stop: threading.Event) -> None:
+    # thread terpisah supaya heartbeat tetap jalan selama job panjang diproses
+    while not stop.is_set():
+        try:
+            redis.set(key, 1, ex=ttl)
+        except Exception as e:
+            logger.error(f"Ingest heartbeat failed: {e}")
+        stop.wait(ttl / 3)
+
+
+def worker_loop(worker_id: int) -> None:
+    import redis as redis_lib
+
+    from domain.documents.ingestion import run_ingestion
+    from infra.db.redis import get_redis
+    from infra.llm.embedder import get_embedder
+
+    settings = get_settings()
+    queue = settings.INGEST_QUEUE
+    redis = get_redis()
+    # client terpisah untuk BLMOVE: socket timeout harus lebih lama dari waktu blocking
+    blocking = redis_lib.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.INGEST_BLOCK_TIMEOUT + settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+
+    worker_key = f"{worker_id}-{uuid.uuid4().hex[:8]}"
+    processing = processing_key(queue, worker_key)
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat,
+        args=(redis, heartbeat_key(queue, worker_key), settings.INGEST_HEARTBEAT_TTL, stop),
+        daemon=True,
+    ).start()
+
+    get_embedder().load()
+    requeue_stale(redis, queue)
+    logger.info(f"Ingest worker {worker_id} ready (queue={queue}, key={worker_key})")
+
+    def _stop(*_):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    last_requeue = time.monotonic()
+    while not stop.is_set():
+        # timeout pendek supaya sinyal stop tetap diperiksa
+        payload = blocking.blmove(queue, processing, settings.INGEST_BLOCK_TIMEOUT, "RIGHT", "LEFT")
+        if payload is None:
+            # worker yang mati saat worker ini sudah jalan juga perlu ditangani
+            if time.monotonic() - last_requeue >= settings.INGEST_HEARTBEAT_TTL:
+                requeue_stale(redis, queue)
+                last_requeue = time.monotonic()
+            continue
+        try:
+            run_ingestion(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Ingest worker {worker_id} error: {e}")
+        finally:
+            # ack: job keluar dari list processing hanya setelah diproses
+            redis.lrem(processing, 1, payload)
+
+    redis.delete(heartbeat_key(queue, worker_key))
+    logger.info(f"Ingest worker {worker_id} stopped")
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Document ingestion workers")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS)
+    args = parser.parse_args()
+
+    if settings.VECTOR_DB_MODE == "local":
+        # Chroma embedded tidak aman dibuka beberapa proses, dan API tidak melihat tulisan worker
+        logger.error("Ingest worker needs VECTOR_DB_MODE=http or numpy; refusing to start with local")
+        sys.exit(1)
+
+    # ukuran pool ekstraksi PDF per worker dibagi dengan jumlah worker sebenarnya
+    os.environ["INGEST_WORKERS"] = str(max(1, args.workers))
+    get_settings.cache_clear()
+
+    if args.workers <= 1:
+        worker_loop(0)
+        return
+
+    procs = [
+        multiprocessing.Process(target=worker_loop, args=(i,), name=f"ingest-{i}")
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+
+    # teruskan SIGTERM (docker stop) ke semua worker
+    def _forward(*_):
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, _forward)
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()